@@ -0,0 +1,115 @@
+"""GPS extraction benchmark: built-in .insv trailer reader vs. the ExifTool query.
+
+Writes synthetic .insv files (a minimal QuickTime header, a video payload of
+--video-mb and an Insta360 metadata trailer holding --samples GPS fixes), then
+times both paths for the rows `extract_gpx_using_proven_method` consumes. The
+file is evicted from the page cache before each run, so the numbers include
+the I/O a card reader or network share would have to do.
+
+The ExifTool side needs a real `exiftool` on PATH (or --exiftool); it also
+checks that both paths produce identical rows. Without one, only the native
+reader is timed.
+
+    python benchmarks/bench_insv_gps.py --video-mb 1024 --samples 36000
+"""
+import argparse
+import os
+import statistics
+import struct
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import vision360  # noqa: E402
+
+FAKES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fakes")
+
+
+def insv_trailer(samples, start=1_700_000_000, rate=10, void_every=0):
+    """ An Insta360 trailer: a filler record, then a GPS record whose header doubles as the start of the 78-byte footer. """
+    gps = bytearray()
+    for i in range(samples):
+        fix = b"V" if void_every and i % void_every == void_every - 1 else b"A"
+        lat, lon = -33.85 - i * 1e-6, 151.2 + i * 5e-7  # southern/eastern hemisphere exercises the sign handling
+        gps += vision360.INSV_GPS_SAMPLE.pack(start + i // rate, 0, (i % rate) * (1000 // rate), fix, abs(lat), b"S", lon, b"E", 4.2, 90.0, 35.0 + (i % 400) * 0.25)
+    filler = os.urandom(4096)
+    body = filler + vision360.INSV_RECORD_HEADER.pack(0x101, len(filler)) + bytes(gps)
+    footer_size = vision360.INSV_FOOTER_SIZE
+    trailer_len = len(body) + footer_size
+    footer = vision360.INSV_RECORD_HEADER.pack(vision360.INSV_GPS_RECORD, len(gps)) + bytes(32) + struct.pack("<II", trailer_len, 3) + vision360.INSV_TRAILER_MAGIC
+    assert len(footer) == footer_size
+    return body + footer
+
+
+def write_synthetic_insv(path, video_mb, samples, **trailer_options):
+    payload = video_mb * 1024 * 1024; chunk = os.urandom(1 << 20)
+    with open(path, "wb") as f:
+        f.write(struct.pack(">I4s4sI", 16, b"ftyp", b"isom", 0x200))
+        f.write(struct.pack(">I4s", 8 + payload, b"mdat"))
+        for _ in range(video_mb): f.write(chunk)
+        f.write(insv_trailer(samples, **trailer_options))
+        f.flush(); os.fsync(f.fileno())
+
+
+def evict(path):
+    if not hasattr(os, "posix_fadvise"): return
+    fd = os.open(path, os.O_RDONLY)
+    try: os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+    finally: os.close(fd)
+
+
+def read_chars():
+    """ Bytes this process has read so far (Linux /proc), or None. """
+    try:
+        with open("/proc/self/io") as f: return next(int(line.split()[1]) for line in f if line.startswith("rchar"))
+    except (OSError, StopIteration): return None
+
+
+def timed(fn, path, runs):
+    times = []; result = None
+    for _ in range(runs):
+        evict(path); start = time.perf_counter(); result = fn(); times.append(time.perf_counter() - start)
+    return times, result
+
+
+def exiftool_rows(exiftool_path, path):
+    rows = []
+    vision360.run_exiftool_gps_query(exiftool_path, path, on_line=rows.append, native=False)
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--video-mb", type=int, default=256, help="size of the synthetic video payload")
+    parser.add_argument("--samples", type=int, default=18_000, help="GPS fixes in the trailer (10 Hz, so 18000 is half an hour)")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--exiftool", help="ExifTool executable (default: the one on PATH)")
+    args = parser.parse_args()
+
+    exiftool_path = args.exiftool or vision360.find_executable("exiftool")
+    if exiftool_path and os.path.realpath(exiftool_path) == os.path.realpath(os.path.join(FAKES, "exiftool")): exiftool_path = None
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "VID_20240101_120000_00_001.insv")
+        write_synthetic_insv(path, args.video_mb, args.samples, void_every=50)
+        size = os.path.getsize(path)
+        print(f"Synthetic clip: {size / 1e6:.0f} MB, {args.samples} GPS samples in the trailer\n")
+
+        before = read_chars(); list(vision360.read_insv_gps_rows(path)); after = read_chars()
+        native_times, native = timed(lambda: list(vision360.read_insv_gps_rows(path)), path, args.runs)
+        print(f"{'reader':10} {'median ms':>10} {'min ms':>8} {'rows':>7} {'rows/s':>10}")
+        print(f"{'native':10} {statistics.median(native_times) * 1e3:>10.1f} {min(native_times) * 1e3:>8.1f} {len(native):>7} {len(native) / statistics.median(native_times):>10.0f}")
+        if exiftool_path:
+            # Sessions start lazily, so one throwaway query keeps Perl startup out of the timing, as in a running batch.
+            exiftool_rows(exiftool_path, path)
+            exif_times, exif = timed(lambda: exiftool_rows(exiftool_path, path), path, args.runs)
+            print(f"{'exiftool':10} {statistics.median(exif_times) * 1e3:>10.1f} {min(exif_times) * 1e3:>8.1f} {len(exif):>7} {len(exif) / statistics.median(exif_times):>10.0f}")
+            print(f"\nSpeed-up: {statistics.median(exif_times) / statistics.median(native_times):.1f}x; rows identical: {exif == native}")
+            vision360.close_exiftool_pools()
+        else:
+            print("\nNo real ExifTool found (pass --exiftool); only the native reader was timed.")
+        if before is not None: print(f"Native reader read {after - before} bytes of the {size} byte file.")
+
+
+if __name__ == "__main__":
+    main()
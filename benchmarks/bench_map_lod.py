@@ -0,0 +1,153 @@
+"""Map Viewer load/redraw benchmark: full polyline vs. level-of-detail pyramid.
+
+Writes a synthetic GPX track, then times what the Map Viewer does with it:
+loading (parse + building what gets drawn) and redrawing the path on zoom
+and pan. Redraws run TkinterMapView's own CanvasPath code against a stub
+canvas, so no display is needed; the real Tk canvas work scales with the
+same vertex counts on top of that.
+
+    python benchmarks/bench_map_lod.py --points 500000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import gpxpy
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import vision360  # noqa: E402
+import vision360_gui  # noqa: E402
+from tkintermapview.canvas_path import CanvasPath  # noqa: E402
+
+VIEW_WIDTH, VIEW_HEIGHT = 860, 560
+ZOOMS = (6, 10, 13, 15, 17)
+
+
+class StubCanvas:
+    def create_line(self, *args, **kwargs): return 1
+    def coords(self, *args): pass
+    def delete(self, *args): pass
+    def tag_bind(self, *args): pass
+
+
+class StubMap:
+    """ Just enough of TkinterMapView for CanvasPath.draw(). """
+    def __init__(self):
+        self.canvas = StubCanvas(); self.width = VIEW_WIDTH; self.height = VIEW_HEIGHT
+        self.canvas_path_list = []; self.zoom = 0
+        self.upper_left_tile_pos = self.lower_right_tile_pos = (0.0, 0.0)
+
+    def manage_z_order(self): pass
+
+    def center_on(self, x, y, zoom):
+        """ x, y in world coordinates [0, 1]. """
+        self.zoom = zoom; scale = 2 ** zoom
+        tiles_w, tiles_h = self.width / 256, self.height / 256
+        self.upper_left_tile_pos = (x * scale - tiles_w / 2, y * scale - tiles_h / 2)
+        self.lower_right_tile_pos = (x * scale + tiles_w / 2, y * scale + tiles_h / 2)
+
+    def pan(self, dx_px, dy_px):
+        dx, dy = dx_px / 256, dy_px / 256
+        self.upper_left_tile_pos = (self.upper_left_tile_pos[0] + dx, self.upper_left_tile_pos[1] + dy)
+        self.lower_right_tile_pos = (self.lower_right_tile_pos[0] + dx, self.lower_right_tile_pos[1] + dy)
+
+    def window(self):
+        scale = 2 ** round(self.zoom)
+        x0, y0 = self.upper_left_tile_pos[0] / scale, self.upper_left_tile_pos[1] / scale
+        x1, y1 = self.lower_right_tile_pos[0] / scale, self.lower_right_tile_pos[1] / scale
+        w, h = x1 - x0, y1 - y0
+        return (x0 - w, y0 - h, x1 + w, y1 + h)
+
+
+def synthetic_track(n, seed=0):
+    """ A wandering ~10 Hz ride: random-walk jitter on top of a slow drift. """
+    rng = np.random.default_rng(seed)
+    drift = np.cumsum(rng.normal(0, 1, (n, 2)) * 1e-5 + np.array([2e-6, 1e-6]), axis=0)
+    jitter = rng.normal(0, 3e-6, (n, 2))
+    lat, lon = 47.0 + drift[:, 0] + jitter[:, 0], 8.0 + drift[:, 1] + jitter[:, 1]
+    ele = 400 + np.cumsum(rng.normal(0, 0.05, n))
+    return lat, lon, ele
+
+
+def write_gpx(path, lat, lon, ele):
+    writer = vision360.GPXStreamWriter(path)
+    start = 1_700_000_000
+    for i, (a, b, c) in enumerate(zip(lat.tolist(), lon.tolist(), ele.tolist())):
+        writer.add_point(a, b, c, time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(start + i // 10)))
+    writer.close()
+
+
+def timed(fn, repeat=1):
+    best = float("inf"); result = None
+    for _ in range(repeat):
+        start = time.perf_counter(); result = fn(); best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def bench_full(gpx_path, centers):
+    def load():
+        with open(gpx_path, "r", encoding="utf-8") as f: gpx = gpxpy.parse(f)
+        return [(p.latitude, p.longitude) for t in gpx.tracks for s in t.segments for p in s.points]
+    load_s, points = timed(load)
+    stub = StubMap(); path = CanvasPath(stub, points, color="#FF0000", width=3)
+    rows = []
+    for zoom in ZOOMS:
+        stub.center_on(*centers[zoom], zoom)
+        zoom_s, _ = timed(lambda: path.draw(move=False), repeat=3)
+        stub.pan(40, 25)
+        pan_s, _ = timed(lambda: path.draw(move=True), repeat=3)
+        rows.append((zoom, len(points), zoom_s, pan_s))
+    return load_s, rows
+
+
+def bench_lod(gpx_path, centers):
+    def load():
+        track = vision360_gui.load_gpx_track(gpx_path, use_sidecar=False)
+        return vision360_gui.TrackLOD(track.lat, track.lon)
+    load_s, lod = timed(load)
+    build_s, _ = timed(lambda: vision360_gui.TrackLOD(lod.lat, lod.lon))
+    stub = StubMap(); rows = []
+    for zoom in ZOOMS:
+        stub.center_on(*centers[zoom], zoom)
+
+        def zoom_redraw():
+            runs, _ = lod.visible_runs(zoom, stub.window())
+            paths = [CanvasPath(stub, run, color="#FF0000", width=3) for run in runs]
+            for path in paths: path.draw(move=False)
+            return paths
+        zoom_s, paths = timed(zoom_redraw, repeat=3)
+        stub.pan(40, 25)
+        pan_s, _ = timed(lambda: [path.draw(move=True) for path in paths], repeat=3)
+        rows.append((zoom, sum(len(p.position_list) for p in paths), zoom_s, pan_s))
+    return load_s, build_s, rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--points", type=int, default=500_000)
+    args = parser.parse_args()
+
+    lat, lon, ele = synthetic_track(args.points)
+    x, y = vision360_gui.mercator_project(lat, lon)
+    # Full-track view at low zooms, a spot mid-track when zoomed in.
+    centers = {z: ((x.min() + x.max()) / 2, (y.min() + y.max()) / 2) if z < 13 else (x[len(x) // 2], y[len(y) // 2]) for z in ZOOMS}
+    with tempfile.TemporaryDirectory() as tmp:
+        gpx_path = os.path.join(tmp, "track.gpx")
+        write_gpx(gpx_path, lat, lon, ele)
+        print(f"Synthetic track: {args.points} points, {os.path.getsize(gpx_path) / 1e6:.1f} MB GPX\n")
+        full_load, full_rows = bench_full(gpx_path, centers)
+        lod_load, lod_build, lod_rows = bench_lod(gpx_path, centers)
+
+    print(f"{'':14}{'load (s)':>10}")
+    print(f"{'full polyline':14}{full_load:>10.2f}")
+    print(f"{'LOD pyramid':14}{lod_load:>10.2f}   (of which pyramid build {lod_build:.2f} s)\n")
+    print(f"{'zoom':>4} | {'full: vertices':>14} {'zoom ms':>9} {'pan ms':>8} | {'LOD: vertices':>13} {'zoom ms':>9} {'pan ms':>8}")
+    for (zoom, full_n, full_zoom, full_pan), (_, lod_n, lod_zoom, lod_pan) in zip(full_rows, lod_rows):
+        print(f"{zoom:>4} | {full_n:>14} {full_zoom * 1e3:>9.1f} {full_pan * 1e3:>8.1f} | {lod_n:>13} {lod_zoom * 1e3:>9.1f} {lod_pan * 1e3:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
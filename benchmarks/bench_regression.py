@@ -0,0 +1,242 @@
+"""Regression benchmarks for the orchestration code, run against stand-in executables.
+
+The real Insta360 SDK cannot run on CI, so benchmarks/fakes/ provides `testSDKDemo`,
+`ffprobe` and `exiftool` scripts with realistic output volumes. They are placed next
+to (symlinks of) vision360.py in a scratch directory, where `find_executable` picks
+them up first, exactly as it would a locally bundled SDK.
+
+Each scenario runs in a fresh interpreter and reports throughput, peak RSS of the
+Python process and latency percentiles. Results are compared with
+benchmarks/baseline.json; the exit code is 1 when a metric regressed beyond
+--tolerance.
+
+    python benchmarks/bench_regression.py                    # run all, compare with baseline
+    python benchmarks/bench_regression.py convert gpx_extract
+    python benchmarks/bench_regression.py --update-baseline
+"""
+import argparse
+import compileall
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO = os.path.dirname(BENCH_DIR)
+BASELINE_PATH = os.path.join(BENCH_DIR, "baseline.json")
+FAKES = ("testSDKDemo", "ffprobe", "exiftool")
+
+
+def percentile(values, q):
+    """ Linear-interpolated q-th percentile (0-100) of a non-empty sequence. """
+    values = sorted(values); k = (len(values) - 1) * q / 100.0
+    lo = int(k); hi = min(lo + 1, len(values) - 1)
+    return values[lo] + (values[hi] - values[lo]) * (k - lo)
+
+
+def latency_metrics(seconds):
+    return {f"p{q}_ms": round(percentile(seconds, q) * 1e3, 2) for q in (50, 95, 99)}
+
+
+def peak_rss_mb():
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)  # ru_maxrss is in KiB on Linux
+
+
+def make_sandbox(path):
+    """ vision360 modules plus the stand-in tools side by side, with a model folder for the SDK. """
+    for module in ("vision360.py", "vision360_gui.py"):
+        os.symlink(os.path.join(REPO, module), os.path.join(path, module))
+    for name in FAKES: shutil.copy2(os.path.join(BENCH_DIR, "fakes", name), os.path.join(path, name))
+    os.makedirs(os.path.join(path, "modelfile"))
+    for model in ("ai_stitcher_model_v1.ins", "colorplus_model.ins", "deflicker_86ccba0d.ins"):
+        open(os.path.join(path, "modelfile", model), "wb").close()
+    # Byte-compile up front so no scenario's peak RSS includes compiling the modules, which grows with their size.
+    compileall.compile_dir(path, maxlevels=0, quiet=1)
+
+
+def write_clips(folder, count, gps_rows=0):
+    """ Placeholder .insv files; the fake ExifTool reads its sample count from the content. """
+    os.makedirs(folder, exist_ok=True); clips = []
+    for i in range(count):
+        clips.append(os.path.join(folder, f"VID_20240101_{i:06d}_00_001.insv"))
+        with open(clips[-1], "w") as f: f.write(str(gps_rows))
+    return clips
+
+
+# --- Scenarios (run inside the sandbox interpreter) ---
+
+def scenario_convert(vision360, work, scale):
+    """ ConversionQueue, as run_conversion drives it, over SDK runs that flood stdout with progress and log lines. """
+    progress_lines, log_lines = int(20000 * scale), int(5000 * scale)
+    os.environ.update(FAKE_SDK_PROGRESS_LINES=str(progress_lines), FAKE_SDK_LOG_LINES=str(log_lines))
+    clips = write_clips(os.path.join(work, "clips"), 8); os.makedirs(os.path.join(work, "out"))
+    log = vision360.LogBuffer(); updates = [0]
+    def on_job(job): updates[0] += 1
+    queue = vision360.ConversionQueue(vision360.find_executable("testSDKDemo"), os.path.join(os.path.dirname(vision360.__file__), "modelfile"), 2, log, job_callback=on_job)
+    enhancements = {"ColorPlus": ("colorplus_model.ins", vision360.ENHANCEMENT_MAP["ColorPlus"]["params"])}
+    start = time.perf_counter()
+    with queue.batch():
+        for clip in clips: queue.submit(clip, os.path.join(work, "out"), "5.7K", "ai_stitcher_model_v1.ins", enhancements)
+    queue.wait(); elapsed = time.perf_counter() - start
+    failed = [job.name for job in queue.jobs if job.state != "done"]
+    if failed: raise RuntimeError(f"conversions failed: {failed}")
+    sdk_lines = len(clips) * (progress_lines + log_lines)
+    return dict(latency_metrics([job.elapsed for job in queue.jobs]), sdk_lines_per_s=round(sdk_lines / elapsed), clips_per_s=round(len(clips) / elapsed, 2),
+                ui_updates_per_clip=round(updates[0] / len(clips), 1))
+
+
+def scenario_gpx_extract(vision360, work, scale):
+    """ extract_gpx_using_proven_method one clip at a time over large GPS dumps. """
+    rows = int(100_000 * scale); clips = write_clips(os.path.join(work, "clips"), 6, rows)
+    exiftool = vision360.find_executable("exiftool"); latencies = []
+    start = time.perf_counter()
+    for clip in clips:
+        t = time.perf_counter()
+        if not vision360.extract_gpx_using_proven_method(exiftool, clip, os.path.splitext(clip)[0] + ".gpx"): raise RuntimeError(f"extraction failed: {clip}")
+        latencies.append(time.perf_counter() - t)
+    elapsed = time.perf_counter() - start
+    return dict(latency_metrics(latencies), rows_per_s=round(len(clips) * rows / elapsed))
+
+
+def scenario_gpx_batch(vision360, work, scale):
+    """ extract_gpx_batch over several pooled ExifTool sessions. """
+    rows = int(50_000 * scale); clips = write_clips(os.path.join(work, "clips"), 12, rows)
+    start = time.perf_counter()
+    results = vision360.extract_gpx_batch(vision360.find_executable("exiftool"), [(c, os.path.splitext(c)[0] + ".gpx") for c in clips], workers=4)
+    elapsed = time.perf_counter() - start
+    if not all(results.values()): raise RuntimeError("batch extraction failed")
+    return {"rows_per_s": round(len(clips) * rows / elapsed), "clips_per_s": round(len(clips) / elapsed, 2)}
+
+
+def scenario_gpx_merge(vision360, work, scale):
+    """ extract_merged_gpx over a day of back-to-back clips that overlap by a second. """
+    rows = int(36_000 * scale); folder = os.path.join(work, "clips"); os.makedirs(folder); clips = []
+    for i in range(12):
+        clips.append(os.path.join(folder, f"VID_20240101_{i:06d}_00_001.insv"))
+        with open(clips[-1], "w") as f: f.write(f"{rows}@{1_700_000_000 + i * (rows // 10 - 1)}")
+    start = time.perf_counter()
+    if not vision360.extract_merged_gpx(vision360.find_executable("exiftool"), clips, os.path.join(work, "day.gpx"), workers=4): raise RuntimeError("merge failed")
+    elapsed = time.perf_counter() - start
+    return {"rows_per_s": round(len(clips) * rows / elapsed), "elapsed_ms": round(elapsed * 1e3, 1)}
+
+
+def scenario_probe(vision360, work, scale):
+    """ get_video_resolution per clip, cold (ffprobe every time) and through a warm MediaCatalog. """
+    clips = write_clips(os.path.join(work, "clips"), max(1, int(100 * scale)))
+    cold = []
+    for clip in clips:
+        t = time.perf_counter()
+        if vision360.get_video_resolution(clip) is None: raise RuntimeError(f"probe failed: {clip}")
+        cold.append(time.perf_counter() - t)
+    catalog = vision360.MediaCatalog(os.path.join(work, "media.sqlite"), vision360.find_executable("ffprobe"))
+    for clip in clips: vision360.get_video_resolution(clip, catalog=catalog)
+    warm = []
+    for clip in clips:
+        t = time.perf_counter(); vision360.get_video_resolution(clip, catalog=catalog); warm.append(time.perf_counter() - t)
+    catalog.close()
+    return dict(latency_metrics(cold), probes_per_s=round(len(clips) / sum(cold), 1), cached_probes_per_s=round(len(clips) / sum(warm)))
+
+
+def scenario_map_load(vision360, work, scale):
+    """ Loading a long GPX track for the Map Viewer, up to the level-of-detail pyramid; then reopening it from its sidecar. """
+    import vision360_gui
+    points = int(200_000 * scale); path = os.path.join(work, "track.gpx")
+    writer = vision360.GPXStreamWriter(path); start = 1_700_000_000
+    for i in range(points): writer.add_point(47.0 + i * 1e-6, 8.0 + i * 5e-7, 400.0 + (i % 500) * 0.1, time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(start + i // 10)))
+    writer.close()
+    latencies, reopens = [], []
+    for _ in range(3):
+        t = time.perf_counter()
+        track = vision360_gui.load_gpx_track(path, use_sidecar=False); vision360_gui.TrackLOD(track.lat, track.lon)
+        latencies.append(time.perf_counter() - t)
+    vision360_gui.load_gpx_track(path)  # writes the sidecar
+    for _ in range(5):
+        t = time.perf_counter(); track = vision360_gui.load_gpx_track(path); track.stats(); reopens.append(time.perf_counter() - t)
+    return dict(latency_metrics(latencies), points_per_s=round(points / percentile(latencies, 50)), sidecar_reopens_per_s=round(1 / percentile(reopens, 50), 1))
+
+
+SCENARIOS = {name[len("scenario_"):]: fn for name, fn in globals().items() if name.startswith("scenario_")}
+
+
+def run_scenario(name, sandbox, scale):
+    sys.path.insert(0, sandbox)
+    import vision360
+    with tempfile.TemporaryDirectory() as work:
+        metrics = SCENARIOS[name](vision360, work, scale)
+    vision360.close_exiftool_pools()
+    metrics["peak_rss_mb"] = peak_rss_mb()
+    json.dump(metrics, sys.stdout)
+
+
+# --- Reporting ---
+
+def higher_is_better(metric):
+    return metric.endswith("_per_s")
+
+
+def compare(results, baseline, tolerance):
+    """ Prints every metric next to its baseline; returns the regressed (scenario, metric) pairs. """
+    regressions = []
+    print(f"{'scenario':12} {'metric':20} {'value':>12} {'baseline':>12} {'change':>8}")
+    for name, metrics in results.items():
+        for metric, value in metrics.items():
+            base = baseline.get(name, {}).get(metric)
+            if not base:
+                print(f"{name:12} {metric:20} {value:>12} {'-':>12} {'':>8}"); continue
+            change = (value - base) / base
+            worse = -change if higher_is_better(metric) else change
+            flag = "  REGRESSION" if worse > tolerance else ""
+            if flag: regressions.append((name, metric))
+            print(f"{name:12} {metric:20} {value:>12} {base:>12} {change:>+7.0%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("scenarios", nargs="*", metavar="scenario", help=f"any of {', '.join(SCENARIOS)} (default: all)")
+    parser.add_argument("--scale", type=float, default=1.0, help="multiply workload sizes (output volumes, clip counts)")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="relative slowdown tolerated before a metric counts as regressed")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--update-baseline", action="store_true", help="store this run as the new baseline")
+    parser.add_argument("--run-scenario", help=argparse.SUPPRESS)
+    parser.add_argument("--sandbox", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.run_scenario: return run_scenario(args.run_scenario, args.sandbox, args.scale)
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown: parser.error(f"unknown scenario(s): {', '.join(sorted(unknown))}")
+
+    results = {}
+    with tempfile.TemporaryDirectory() as sandbox:
+        make_sandbox(sandbox)
+        for name in args.scenarios or SCENARIOS:
+            print(f"[*] {name}...", file=sys.stderr, flush=True)
+            child = subprocess.run([sys.executable, os.path.abspath(__file__), "--run-scenario", name, "--sandbox", sandbox, "--scale", str(args.scale)],
+                                   capture_output=True, text=True)
+            if child.returncode: sys.stderr.write(child.stderr); return 2
+            results[name] = json.loads(child.stdout)
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f: stored = json.load(f)
+        if stored.get("scale") == args.scale: baseline = stored["results"]
+        else: print(f"[!] Baseline was recorded at --scale {stored.get('scale')}; not comparing.", file=sys.stderr)
+    regressions = compare(results, baseline, args.tolerance)
+    if args.update_baseline:
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as f: results = dict(json.load(f).get("results", {}), **results)
+        with open(args.baseline, "w") as f:
+            json.dump({"scale": args.scale, "python": platform.python_version(), "machine": f"{platform.machine()}, {os.cpu_count()} CPUs", "results": results}, f, indent=2)
+            f.write("\n")
+        print(f"\n[+] Baseline written to {args.baseline}")
+        return 0
+    if regressions: print(f"\n[!] {len(regressions)} metric(s) regressed by more than {args.tolerance:.0%}.")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,65 @@
+"""Cold-start benchmark: headless CLI imports vs. the full GUI stack.
+
+Runs fresh interpreters with `-X importtime` and reports, per scenario, the
+wall-clock time to finish importing and the heaviest top-level imports.
+`cli` is what `vision360 convert|gpx|probe` loads; `gui` adds the Tk front
+end, the map widget and NumPy, which is what every start used to pay.
+
+    python benchmarks/bench_startup.py --runs 10
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCENARIOS = {
+    "cli": "import vision360",
+    "cli --help": "import sys, vision360; sys.argv = ['vision360', 'probe', '--help']; vision360.main()",
+    "gui": "import vision360_gui",
+}
+
+
+def run_once(code):
+    """ Wall seconds for one interpreter run, and {module: (nesting depth, cumulative us)} from -X importtime. """
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=REPO, capture_output=True, text=True)
+    wall = time.perf_counter() - start
+    if result.returncode:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+    modules = {}
+    for line in result.stderr.splitlines():
+        # "import time: self [us] | cumulative | imported package", nesting shown by indentation.
+        if not line.startswith("import time:") or "cumulative" in line: continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        if depth <= 1: modules[name.strip()] = (depth, int(cumulative))
+    return wall, modules
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--top", type=int, default=8, help="heaviest imports to list per scenario")
+    args = parser.parse_args()
+
+    run_once("pass")  # warm the OS page cache so every scenario starts from the same point
+    print(f"{'scenario':12} {'median ms':>10} {'min ms':>8} {'imports ms':>11}")
+    details = {}
+    for name, code in SCENARIOS.items():
+        walls, imports = [], []
+        for _ in range(args.runs):
+            wall, modules = run_once(code); walls.append(wall); imports.append(sum(us for depth, us in modules.values() if depth == 0))
+        details[name] = modules
+        print(f"{name:12} {statistics.median(walls) * 1e3:>10.1f} {min(walls) * 1e3:>8.1f} {statistics.median(imports) / 1e3:>11.1f}")
+    for name, modules in details.items():
+        print(f"\nHeaviest imports ({name}):")
+        # Top-level imports and what they pull in directly, e.g. vision360_gui -> tkintermapview.
+        for module, (_, us) in sorted(modules.items(), key=lambda item: -item[1][1])[:args.top]:
+            print(f"  {us / 1e3:>8.1f} ms  {module}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""Persistent ExifTool sessions: the -stay_open protocol, pipelining and restarts, against stand-in ExifTools."""
+import os
+import stat
+import sys
+import time
+import textwrap
+
+import pytest
+
+import vision360
+
+FAKE_EXIFTOOL = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks", "fakes", "exiftool")
+
+# Like benchmarks/fakes/exiftool in -stay_open mode, but logs every process start and every file it is asked about,
+# and exits (code 9) on files whose name contains "crash" (only the first time, for "crash-once").
+CRASHING_EXIFTOOL = textwrap.dedent("""\
+    #!{python}
+    import os, sys
+    log = os.environ["FAKE_EXIFTOOL_LOG"]
+    def note(text):
+        with open(log, "a") as f: f.write(text + "\\n")
+    note("start")
+    args = []
+    for line in sys.stdin:
+        line = line.rstrip("\\n")
+        if args[-1:] == ["-stay_open"] and line == "False": break
+        if not line.startswith("-execute"): args.append(line); continue
+        k = args.index("-echo4"); echo, path = args[k + 1], args[k - 1]; name = os.path.basename(path)
+        note(name)
+        if "crash" in name and not ("once" in name and os.path.exists(path + ".crashed")):
+            open(path + ".crashed", "w").close(); sys.exit(9)
+        sys.stdout.write(name + "\\n{{ready%s}}\\n" % line[len("-execute"):]); sys.stdout.flush()
+        sys.stderr.write(echo + "\\n"); sys.stderr.flush()
+        args = []
+""")
+
+
+@pytest.fixture
+def crashing_exiftool(tmp_path, monkeypatch):
+    path = tmp_path / "exiftool"
+    path.write_text(CRASHING_EXIFTOOL.format(python=sys.executable)); path.chmod(path.stat().st_mode | stat.S_IEXEC)
+    log = tmp_path / "calls.log"; monkeypatch.setenv("FAKE_EXIFTOOL_LOG", str(log))
+    return str(path), lambda: log.read_text().split()
+
+
+@pytest.fixture
+def clips(tmp_path):
+    def make(*names):
+        paths = []
+        for name in names:
+            (tmp_path / name).write_bytes(b"1"); paths.append(str(tmp_path / name))
+        return paths
+    return make
+
+
+def test_session_answers_pipelined_requests_in_order(tmp_path):
+    session = vision360.ExifToolSession(FAKE_EXIFTOOL)
+    try:
+        paths = []
+        for i in range(8):
+            path = tmp_path / f"clip{i}.insv"; path.write_bytes(f"{i + 1}@{1_700_000_000 + 60 * i}".encode()); paths.append(str(path))
+        # All requests are written before any reply is read, so replies must be matched back by their {readyN} markers.
+        futures = [session.submit(["-ee", "-p", "$gpsdatetime", "-d", "%Y-%m-%dT%H:%M:%SZ", path]) for path in paths]
+        for i, future in enumerate(futures):
+            stdout, stderr = future.result(10)
+            assert stdout.split() == [time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(1_700_000_000 + 60 * i))] * (i + 1)
+            assert stderr == ""
+        assert session.load == 0 and session.alive
+    finally: session.close()
+    assert session.process.returncode == 0
+
+
+def test_session_streams_lines_and_reports_errors(tmp_path):
+    session = vision360.ExifToolSession(FAKE_EXIFTOOL)
+    try:
+        path = tmp_path / "clip.insv"; path.write_bytes(b"5@1700000000"); lines = []
+        assert session.submit(vision360.GPS_EXIFTOOL_ARGS + [str(path)], lines.append).result(10) == ("", "")
+        assert len(lines) == 5 and all(line.count(",") == 3 for line in lines)
+        stdout, stderr = session.execute(["-p", "$gpsdatetime", str(tmp_path / "missing.insv")], 10)
+        assert stdout == "" and "File not found" in stderr
+    finally: session.close()
+
+
+def test_pool_keeps_sessions_alive_between_requests(crashing_exiftool, clips):
+    exiftool, calls = crashing_exiftool
+    pool = vision360.ExifToolPool(exiftool, size=1)
+    try:
+        paths = clips("a.insv", "b.insv", "c.insv")
+        assert [pool.execute([path], 10)[0] for path in paths] == ["a.insv\n", "b.insv\n", "c.insv\n"]
+        assert calls() == ["start", "a.insv", "b.insv", "c.insv"]
+    finally: pool.close()
+
+
+def test_pool_retries_in_flight_requests_on_a_restarted_session(crashing_exiftool, clips):
+    exiftool, calls = crashing_exiftool
+    pool = vision360.ExifToolPool(exiftool, size=1)
+    try:
+        paths = clips("a.insv", "crash-once.insv", "c.insv", "d.insv")
+        futures = [pool.submit([path]) for path in paths]
+        assert [future.result(10)[0] for future in futures] == ["a.insv\n", "crash-once.insv\n", "c.insv\n", "d.insv\n"]
+        # The crash takes down the requests queued behind it too; all of them are replayed on a fresh process.
+        assert calls() == ["start", "a.insv", "crash-once.insv", "start", "crash-once.insv", "c.insv", "d.insv"]
+        assert len(pool._sessions) == 1 and pool._sessions[0].alive
+    finally: pool.close()
+
+
+def test_pool_retries_only_once(crashing_exiftool, clips):
+    exiftool, calls = crashing_exiftool
+    pool = vision360.ExifToolPool(exiftool, size=1)
+    try:
+        crash, after = clips("crash.insv", "after.insv")
+        with pytest.raises(vision360.ExifToolCrashed, match="code 9"): pool.execute([crash], 10)
+        assert calls().count("crash.insv") == 2
+        assert pool.execute([after], 10)[0] == "after.insv\n"
+        assert calls().count("start") == 3
+    finally: pool.close()
+
+
+def test_streamed_request_is_not_replayed_after_output_was_consumed(crashing_exiftool, clips, tmp_path):
+    exiftool, calls = crashing_exiftool
+    pool = vision360.ExifToolPool(exiftool, size=1)
+    try:
+        # The session's reply to "a" is streamed to on_line; a crash afterwards must not fail or replay it.
+        a, crash = clips("a.insv", "crash.insv"); lines = []
+        first, second = pool.submit([a], lines.append), pool.submit([crash], lines.append)
+        assert first.result(10) == ("", "")
+        with pytest.raises(vision360.ExifToolCrashed): second.result(10)
+        assert lines == ["a.insv\n"] and calls().count("a.insv") == 1
+    finally: pool.close()
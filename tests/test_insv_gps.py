@@ -0,0 +1,123 @@
+"""Built-in .insv trailer GPS reader, checked against synthetic trailers."""
+import os
+import struct
+
+import pytest
+
+import vision360
+
+FAKE_EXIFTOOL = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks", "fakes", "exiftool")
+
+
+def gps_fix(seconds, lat, lat_ref, lon, lon_ref, alt, fix=b"A"):
+    return vision360.INSV_GPS_SAMPLE.pack(seconds, 0, 0, fix, lat, lat_ref, lon, lon_ref, 4.2, 90.0, alt)
+
+
+def insv_trailer(fixes, gps=True, trailer_len=None):
+    """ A filler record, then a GPS record (unless not `gps`) whose header starts the 78-byte footer. """
+    data = b"".join(fixes)
+    filler = os.urandom(256)
+    body = filler + vision360.INSV_RECORD_HEADER.pack(0x101, len(filler))
+    if gps: body += data; last = vision360.INSV_RECORD_HEADER.pack(vision360.INSV_GPS_RECORD, len(data))
+    else: body = filler; last = vision360.INSV_RECORD_HEADER.pack(0x101, len(filler))
+    if trailer_len is None: trailer_len = len(body) + vision360.INSV_FOOTER_SIZE
+    return body + last + bytes(32) + struct.pack("<II", trailer_len, 3) + vision360.INSV_TRAILER_MAGIC
+
+
+@pytest.fixture
+def write_insv(tmp_path):
+    def write(trailer, name="VID_20240101_120000_00_001.insv", video=b"\0" * 4096):
+        path = tmp_path / name
+        path.write_bytes(struct.pack(">I4s4sI", 16, b"ftyp", b"isom", 0x200) + video + trailer)
+        return str(path)
+    return write
+
+
+def rows(path):
+    result = vision360.read_insv_gps_rows(path)
+    return None if result is None else list(result)
+
+
+def test_rows_match_exiftool_format(write_insv):
+    path = write_insv(insv_trailer([gps_fix(1_700_000_000, 47.5, b"N", 8.25, b"E", 412.5), gps_fix(1_700_000_001, 47.500001, b"N", 8.250001, b"E", 412.75)]))
+    assert rows(path) == ["2023-11-14T22:13:20Z,47.5,8.25,412.5\n", "2023-11-14T22:13:21Z,47.500001,8.250001,412.75\n"]
+
+
+def test_south_and_west_are_negative(write_insv):
+    path = write_insv(insv_trailer([gps_fix(1_700_000_000, 33.85, b"S", 70.5, b"W", 10.0), gps_fix(1_700_000_001, -33.85, b"S", -70.5, b"W", 10.0),
+                                    gps_fix(1_700_000_002, 33.85, b"N", 151.2, b"E", -3.5)]))
+    assert rows(path) == ["2023-11-14T22:13:20Z,-33.85,-70.5,10\n", "2023-11-14T22:13:21Z,-33.85,-70.5,10\n", "2023-11-14T22:13:22Z,33.85,151.2,-3.5\n"]
+
+
+def test_ouest_longitude_ref_is_west(write_insv):
+    path = write_insv(insv_trailer([gps_fix(1_700_000_000, 48.85, b"N", 2.35, b"O", 35.0)]))
+    assert rows(path) == ["2023-11-14T22:13:20Z,48.85,-2.35,35\n"]
+
+
+def test_void_fixes_are_skipped(write_insv):
+    # Void fixes may carry garbage refs; they must neither be emitted nor make the layout look unknown.
+    path = write_insv(insv_trailer([gps_fix(1_700_000_000, 0.0, b"\0", 0.0, b"\0", 0.0, fix=b"V"), gps_fix(1_700_000_001, 1.0, b"N", 2.0, b"E", 3.0),
+                                    gps_fix(1_700_000_002, 1.0, b"N", 2.0, b"E", 3.0, fix=b"V")]))
+    assert rows(path) == ["2023-11-14T22:13:21Z,1,2,3\n"]
+
+
+def test_unknown_hemisphere_ref_is_not_recognized(write_insv):
+    path = write_insv(insv_trailer([gps_fix(1_700_000_000, 1.0, b"N", 2.0, b"E", 3.0), gps_fix(1_700_000_001, 1.0, b"X", 2.0, b"E", 3.0)]))
+    assert vision360.read_insv_gps_rows(path) is None
+
+
+def test_rows_are_streamed_across_chunks(write_insv, monkeypatch):
+    monkeypatch.setattr(vision360, "INSV_GPS_CHUNK_SAMPLES", 3)
+    path = write_insv(insv_trailer([gps_fix(1_700_000_000 + i, 1.0 + i, b"N", 2.0, b"E", 3.0) for i in range(10)]))
+    result = vision360.read_insv_gps_rows(path)
+    assert not isinstance(result, list)
+    assert [row.split(",")[1] for row in result] == [str(1 + i) for i in range(10)]
+
+
+@pytest.mark.parametrize("trailer_len", [10 ** 9, vision360.INSV_FOOTER_SIZE])
+def test_bad_trailer_length(write_insv, trailer_len):
+    # Longer than the file, or too short to hold the GPS record.
+    assert rows(write_insv(insv_trailer([gps_fix(1_700_000_000, 1.0, b"N", 2.0, b"E", 3.0)], trailer_len=trailer_len))) is None
+
+
+def test_no_gps_record(write_insv):
+    assert rows(write_insv(insv_trailer([], gps=False))) is None
+
+
+def test_no_trailer(write_insv):
+    assert rows(write_insv(b"")) is None
+
+
+@pytest.mark.parametrize("cut", [1, vision360.INSV_FOOTER_SIZE, vision360.INSV_FOOTER_SIZE + 20])
+def test_truncated_file(write_insv, cut):
+    trailer = insv_trailer([gps_fix(1_700_000_000 + i, 1.0, b"N", 2.0, b"E", 3.0) for i in range(4)])
+    assert rows(write_insv(trailer[:-cut])) is None
+
+
+def test_tiny_file(tmp_path):
+    path = tmp_path / "tiny.insv"; path.write_bytes(vision360.INSV_TRAILER_MAGIC)
+    assert rows(str(path)) is None
+
+
+@pytest.fixture
+def exiftool_pools():
+    yield
+    vision360.close_exiftool_pools()
+
+
+def test_falls_back_to_exiftool(tmp_path, exiftool_pools):
+    # The stand-in reports "<samples>@<start epoch>" samples for any file, so only ExifTool can produce these rows.
+    path = tmp_path / "other.insv"; path.write_bytes(b"3@1700000000")
+    lines = []
+    vision360.run_exiftool_gps_query(FAKE_EXIFTOOL, str(path), on_line=lines.append, native=True)
+    assert [line.split(",")[0] for line in lines] == ["2023-11-14T22:13:20Z"] * 3
+
+
+def test_batch_mixes_trailer_and_exiftool_files(tmp_path, write_insv, exiftool_pools):
+    native = write_insv(insv_trailer([gps_fix(1_700_000_000 + i, 1.0, b"S", 2.0, b"W", 3.0) for i in range(5)]))
+    other = tmp_path / "other.insv"; other.write_bytes(b"7@1700000000")
+    items = [(native, str(tmp_path / "native.gpx")), (str(other), str(tmp_path / "other.gpx"))]
+    assert vision360.extract_gpx_batch(FAKE_EXIFTOOL, items, workers=2, native=True) == {native: True, str(other): True}
+    assert (tmp_path / "native.gpx").read_text().count("<trkpt") == 5
+    assert '<trkpt lat="-1.0" lon="-2.0">' in (tmp_path / "native.gpx").read_text()
+    assert (tmp_path / "other.gpx").read_text().count("<trkpt") == 7
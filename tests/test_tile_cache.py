@@ -0,0 +1,87 @@
+"""Map tile cache against a stand-in tile server on 127.0.0.1."""
+import http.server
+import threading
+
+import pytest
+
+vision360_gui = pytest.importorskip("vision360_gui")
+
+PNG = b"\x89PNG\r\n\x1a\n" + b"\0" * 1000
+
+
+class TileHandler(http.server.BaseHTTPRequestHandler):
+    """ /z/x/y.png answers a 1008-byte PNG, except /9/... (404) and /portal/... (an HTML login page). """
+    def do_GET(self):
+        self.server.requests.append(self.path)
+        if self.path.startswith("/9/"): self.send_error(404); return
+        body, kind = (b"<html>Please log in</html>", "text/html") if self.path.startswith("/portal/") else (PNG, "image/png")
+        self.send_response(200); self.send_header("Content-Type", kind); self.send_header("Content-Length", str(len(body))); self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args): pass
+
+
+@pytest.fixture
+def tile_server():
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), TileHandler); server.requests = []
+    thread = threading.Thread(target=server.serve_forever, daemon=True); thread.start()
+    yield server, f"http://127.0.0.1:{server.server_address[1]}/{{z}}/{{x}}/{{y}}.png"
+    server.shutdown(); server.server_close()
+
+
+@pytest.fixture
+def cache(tmp_path):
+    caches = []
+    def open_cache(max_bytes=vision360_gui.TILE_CACHE_MAX_BYTES):
+        caches.append(vision360_gui.TileCache(str(tmp_path / "tiles.sqlite"), max_bytes=max_bytes, timeout=2)); return caches[-1]
+    yield open_cache
+    for tile_cache in caches:
+        try: tile_cache.close()
+        except Exception: pass
+
+
+def test_miss_downloads_and_hit_is_served_from_disk(tile_server, cache):
+    server, url = tile_server; tiles = cache()
+    assert tiles.fetch(url, 3, 4, 5) == PNG
+    assert tiles.fetch(url, 3, 4, 5) == PNG
+    assert server.requests == ["/3/4/5.png"] and (tiles.hits, tiles.misses) == (1, 1)
+    tiles.close()
+    assert cache().fetch(url, 3, 4, 5) == PNG and server.requests == ["/3/4/5.png"]
+
+
+def test_missing_tile_is_not_cached(tile_server, cache):
+    server, url = tile_server; tiles = cache()
+    assert tiles.fetch(url, 9, 1, 1) is None
+    assert not tiles.contains(url, 9, 1, 1)
+
+
+def test_non_image_responses_are_not_cached(tile_server, cache):
+    server, url = tile_server; tiles = cache(); portal = url.replace("/{z}", "/portal/{z}")
+    with pytest.raises(OSError, match="not return an image"): tiles.fetch(portal, 3, 4, 5)
+    assert not tiles.contains(portal, 3, 4, 5) and tiles.total_bytes == 0
+
+
+def test_least_recently_used_tiles_are_evicted_at_the_byte_cap(tile_server, cache):
+    server, url = tile_server; tiles = cache(max_bytes=len(PNG) * 4)
+    for x in range(4): tiles.fetch(url, 5, x, 0)
+    tiles.fetch(url, 5, 0, 0)  # a hit makes tile 0 the most recently used
+    tiles.fetch(url, 5, 4, 0)  # over the cap: evicts down to 90%, i.e. the two least recently used tiles
+    assert [tiles.contains(url, 5, x, 0) for x in range(5)] == [True, False, False, True, True]
+    assert tiles.total_bytes == 3 * len(PNG) <= tiles.max_bytes
+
+
+def test_hit_order_survives_a_restart(tile_server, cache):
+    server, url = tile_server; tiles = cache(max_bytes=len(PNG) * 3)
+    for x in range(3): tiles.fetch(url, 5, x, 0)
+    tiles.fetch(url, 5, 0, 0); tiles.close()
+    tiles = cache(max_bytes=len(PNG) * 3); tiles.fetch(url, 5, 3, 0)
+    assert [tiles.contains(url, 5, x, 0) for x in range(4)] == [True, False, False, True]
+
+
+def test_offline_serves_cached_tiles_and_raises_for_the_rest(tile_server, cache):
+    server, url = tile_server; tiles = cache()
+    tiles.fetch(url, 3, 4, 5)
+    server.shutdown(); server.server_close()
+    assert tiles.fetch(url, 3, 4, 5) == PNG
+    with pytest.raises(OSError): tiles.fetch(url, 3, 4, 6)
+    assert not tiles.contains(url, 3, 4, 6)
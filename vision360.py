@@ -1,17 +1,31 @@
-import tkinter as tk
-from tkinter import ttk, filedialog, scrolledtext, messagebox
+""" Vision360 Toolbox: Insta360 .insv conversion and GPS extraction.
+
+The backend below has no GUI dependencies; `main()` runs the headless CLI and only
+imports the Tk application (vision360_gui) when started without a subcommand.
+"""
 import subprocess
 import os
 import shutil
 import re
 import threading
 import json
+import time
+import atexit
+import functools
+import contextlib
+import hashlib
+import heapq
+import tempfile
+import calendar
+import select
+import signal
+import struct
+import sqlite3
+import argparse
+from collections import deque
+from concurrent.futures import Future, wait as wait_futures, FIRST_COMPLETED
 from glob import glob
 import datetime
-import gpxpy
-import gpxpy.gpx
-from tkintermapview import TkinterMapView
-import webbrowser
 import sys  # <-- שינוי 1: נוסף import נדרש
 
 # --- פונקציית עזר לאיתור קבצים בסביבת PyInstaller ---
@@ -27,24 +41,417 @@ def resource_path(relative_path):
 
 # --- Backend Logic (No changes here) ---
 
+@functools.lru_cache(maxsize=None)
 def find_executable(name: str) -> str:
     base_path = os.path.dirname(os.path.abspath(__file__))
     local_path = os.path.join(base_path, name)
     if os.path.isfile(local_path): return local_path
     return shutil.which(name)
 
-def extract_gpx_using_proven_method(exiftool_path: str, video_path: str, output_gpx_path: str, log_callback=None):
+# --- Persistent ExifTool Sessions ---
+
+GPS_EXIFTOOL_ARGS = ["-ee", "-p", "$gpsdatetime,$gpslatitude#,$gpslongitude#,$gpsaltitude#", "-d", "%Y-%m-%dT%H:%M:%SZ"]
+EXIFTOOL_READY_RE = re.compile(rb"^\{ready(\d+)\}\s*$")
+
+class ExifToolError(RuntimeError):
+    pass
+
+class ExifToolCrashed(ExifToolError):
+    pass
+
+class ExifToolRequest:
+    __slots__ = ("request_id", "future", "stdout", "stderr", "markers", "on_line", "lines_delivered", "error")
+    def __init__(self, request_id: int, on_line=None):
+        self.request_id = request_id; self.future = Future(); self.stdout = []; self.stderr = []; self.markers = 0
+        self.on_line = on_line; self.lines_delivered = 0; self.error = None
+
+class ExifToolSession:
+    """ A long-lived `exiftool -stay_open True -@ -` process serving pipelined requests.
+
+    Every request ends with `-echo4 {readyN}` and `-execute{N}`, so replies on stdout and
+    stderr are matched back to their request by the numbered ready markers.
+    """
+    def __init__(self, exiftool_path: str):
+        self.exiftool_path = exiftool_path
+        self.process = subprocess.Popen([exiftool_path, "-stay_open", "True", "-@", "-"], stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        self._pending = {}; self._next_id = 1; self._lock = threading.Lock(); self._closed = False; self._eof = False
+        self._awaiting = {1: deque(), 2: deque()}
+        for stream, index in ((self.process.stdout, 1), (self.process.stderr, 2)):
+            threading.Thread(target=self._read_replies, args=(stream, index), daemon=True).start()
+
+    @property
+    def alive(self) -> bool: return not (self._closed or self._eof) and self.process.poll() is None
+
+    @property
+    def load(self) -> int: return len(self._pending)
+
+    def submit(self, args, on_line=None) -> Future:
+        """ Queues one ExifTool command; the future resolves to (stdout, stderr) text.
+
+        With `on_line`, stdout lines are handed over one by one as they arrive instead of being collected.
+        """
+        return self._submit(args, on_line).future
+
+    def _submit(self, args, on_line=None) -> ExifToolRequest:
+        if any("\n" in arg for arg in args): raise ValueError("ExifTool arguments may not contain newlines.")
+        with self._lock:
+            if not self.alive: raise ExifToolCrashed("ExifTool session is not running.")
+            request = ExifToolRequest(self._next_id, on_line); self._next_id += 1
+            payload = b"".join(os.fsencode(arg) + b"\n" for arg in args) + f"-echo4\n{{ready{request.request_id}}}\n-execute{request.request_id}\n".encode()
+            # Register before writing: the reader threads may see the reply before this method returns.
+            self._pending[request.request_id] = request; self._awaiting[1].append(request); self._awaiting[2].append(request)
+            try: self.process.stdin.write(payload); self.process.stdin.flush()
+            except OSError as e:
+                # The reader threads fail everything still pending once they hit EOF.
+                self._eof = True; raise ExifToolCrashed(f"ExifTool session died: {e}")
+        return request
+
+    def execute(self, args, timeout: float = None):
+        return self.submit(args).result(timeout)
+
+    def close(self):
+        with self._lock:
+            if self._closed: return
+            self._closed = True
+            try: self.process.stdin.write(b"-stay_open\nFalse\n"); self.process.stdin.close()
+            except OSError: pass
+        try: self.process.wait(timeout=5)
+        except subprocess.TimeoutExpired: self.process.kill(); self.process.wait()
+
+    def _read_replies(self, stream, index: int):
+        # ExifTool answers strictly in submission order, so unmarked lines belong to the oldest open request.
+        awaiting = self._awaiting[index]
+        for line in iter(stream.readline, b""):
+            ready = EXIFTOOL_READY_RE.match(line)
+            if not awaiting: continue
+            request = awaiting[0]
+            if not ready:
+                # A request the other stream already failed may be retried with the same on_line; stop feeding it.
+                if request.future.done(): continue
+                if index == 2 or request.on_line is None: (request.stdout if index == 1 else request.stderr).append(line)
+                elif request.error is None:
+                    try: request.on_line(line.decode("utf-8", "replace")); request.lines_delivered += 1
+                    except Exception as e: request.error = e
+                continue
+            with self._lock:
+                awaiting.popleft(); request.markers += 1
+                if request.markers < 2 or self._pending.pop(request.request_id, None) is None: continue
+            if request.error: request.future.set_exception(request.error)
+            else: request.future.set_result((b"".join(request.stdout).decode("utf-8", "replace"), b"".join(request.stderr).decode("utf-8", "replace")))
+        # Only requests whose marker never came on this stream are lost: the other stream may still be reading earlier, complete replies.
+        with self._lock:
+            self._eof = True; failed = [request for request in awaiting if self._pending.pop(request.request_id, None) is not None]; awaiting.clear()
+        if failed: self.process.wait()
+        for request in failed: request.future.set_exception(ExifToolCrashed(f"ExifTool exited unexpectedly (code {self.process.returncode})."))
+
+class ExifToolPool:
+    """ A set of ExifTool sessions shared by all extractions; crashed sessions are restarted. """
+    def __init__(self, exiftool_path: str, size: int = 1, retries: int = 1):
+        self.exiftool_path = exiftool_path; self.size = max(1, size); self.retries = retries
+        self._sessions = []; self._lock = threading.Lock()
+
+    def resize(self, size: int):
+        with self._lock:
+            self.size = max(1, size)
+            while len(self._sessions) > self.size: self._sessions.pop().close()
+
+    def submit(self, args, on_line=None) -> Future:
+        outer = Future(); self._dispatch(list(args), outer, self.retries, on_line)
+        return outer
+
+    def execute(self, args, timeout: float = None):
+        return self.submit(args).result(timeout)
+
+    def close(self):
+        with self._lock: sessions, self._sessions = self._sessions, []
+        for session in sessions: session.close()
+
+    def _session(self) -> ExifToolSession:
+        with self._lock:
+            self._sessions = [s for s in self._sessions if s.alive]
+            idle = min(self._sessions, key=lambda s: s.load, default=None)
+            if idle is None or (idle.load and len(self._sessions) < self.size):
+                idle = ExifToolSession(self.exiftool_path); self._sessions.append(idle)
+            return idle
+
+    def _dispatch(self, args, outer: Future, retries: int, on_line=None):
+        try: request = self._session()._submit(args, on_line)
+        except ExifToolCrashed as e:
+            if retries: return self._dispatch(args, outer, retries - 1, on_line)
+            return outer.set_exception(e)
+        except Exception as e: return outer.set_exception(e)
+        def done(f):
+            error = f.exception()
+            # A streamed request is only safe to replay if none of its output was consumed yet.
+            if isinstance(error, ExifToolCrashed) and retries and not request.lines_delivered: self._dispatch(args, outer, retries - 1, on_line)
+            elif error: outer.set_exception(error)
+            else: outer.set_result(f.result())
+        request.future.add_done_callback(done)
+
+_exiftool_pools = {}
+_exiftool_pools_lock = threading.Lock()
+
+def get_exiftool_pool(exiftool_path: str, size: int = 1) -> ExifToolPool:
+    """ Returns the process-wide pool for `exiftool_path`, growing it to at least `size` sessions. """
+    with _exiftool_pools_lock:
+        pool = _exiftool_pools.get(exiftool_path)
+        if pool is None: pool = _exiftool_pools[exiftool_path] = ExifToolPool(exiftool_path, size)
+        elif pool.size < size: pool.resize(size)
+        return pool
+
+@atexit.register
+def close_exiftool_pools():
+    with _exiftool_pools_lock: pools = list(_exiftool_pools.values()); _exiftool_pools.clear()
+    for pool in pools: pool.close()
+
+def run_exiftool_gps_query(exiftool_path: str, video_path: str, pool: ExifToolPool = None, on_line=None, native: bool = False):
+    """ Runs the GPS query for `video_path` and returns ExifTool's (stdout, stderr).
+
+    With `on_line`, each `time,lat,lon,alt` row is handed over as it arrives and stdout comes back empty.
+    With `native`, Insta360 trailers are decoded directly and ExifTool only runs for files the built-in reader does not recognize.
+    """
+    rows = read_insv_gps_rows(video_path) if native else None
+    if rows is not None:
+        if on_line is None: return "".join(rows), ""
+        for row in rows: on_line(row)
+        return "", ""
+    if "\n" not in video_path: return (pool or get_exiftool_pool(exiftool_path)).submit(GPS_EXIFTOOL_ARGS + [video_path], on_line).result()
+    # The argument-file protocol cannot carry such paths, so fall back to a one-off run.
+    command = [exiftool_path] + GPS_EXIFTOOL_ARGS + [video_path]
+    if on_line is None:
+        result = subprocess.run(command, capture_output=True, text=True, check=True, encoding='utf-8')
+        return result.stdout, result.stderr
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True, encoding='utf-8', errors='replace')
+    for line in process.stdout: on_line(line)
+    if process.wait(): raise subprocess.CalledProcessError(process.returncode, command)
+    return "", ""
+
+def log_missing_gps_output(stderr: str, log_callback=None):
+    if not log_callback: return
+    if stderr.strip(): log_callback(f"[!] ERROR: ExifTool failed: {stderr.strip().splitlines()[0]}", "error"); log_callback(f"    This often means no GPS tags were found in the file.", "error")
+    else: log_callback("[!] ERROR: ExifTool extracted no GPS data.", "error")
+
+def extract_gpx_using_proven_method(exiftool_path: str, video_path: str, output_gpx_path: str, log_callback=None, pool: ExifToolPool = None, streaming: bool = True, catalog=None, native: bool = False):
     if log_callback: log_callback(f"[*] Starting proven GPX extraction for: {os.path.basename(video_path)}")
-    command = [exiftool_path, "-ee", "-p", "$gpsdatetime,$gpslatitude#,$gpslongitude#,$gpsaltitude#", "-d", "%Y-%m-%dT%H:%M:%SZ", video_path]
+    known = catalog.lookup(video_path) if catalog else None
+    if known and known["has_gps"] == 0:
+        if log_callback: log_callback("[!] ERROR: ExifTool extracted no GPS data (file unchanged since it was last checked).", "error")
+        return False
+    writer = None
     try:
-        result = subprocess.run(command, capture_output=True, text=True, check=True, encoding='utf-8')
-        gps_raw_data = result.stdout
-        if not gps_raw_data.strip():
-            if log_callback: log_callback("[!] ERROR: ExifTool extracted no GPS data.", "error"); return False
-    except subprocess.CalledProcessError:
-        if log_callback: log_callback(f"    This often means no GPS tags were found in the file.", "error"); return False
+        writer = GPXStreamWriter(output_gpx_path) if streaming else None
+        gps_raw_data, stderr = run_exiftool_gps_query(exiftool_path, video_path, pool, writer.add_row if writer else None, native)
+    except (subprocess.CalledProcessError, ExifToolError) as e:
+        if writer: writer.abort()
+        if log_callback: log_callback(f"[!] ERROR: ExifTool failed: {e}", "error"); log_callback(f"    This often means no GPS tags were found in the file.", "error")
+        return False
     except Exception as e:
+        if writer: writer.abort()
         if log_callback: log_callback(f"[!] An unexpected error occurred with ExifTool: {e}", "error"); return False
+    if writer:
+        success = finish_gpx_stream(writer, stderr, log_callback)
+        # "No GPS" is only remembered when ExifTool ran cleanly; a read error may well go away next time.
+        if catalog and (success or not (writer.rows_seen or stderr.strip())): catalog.record_gps(video_path, writer.first_time, writer.last_time, writer.point_count)
+        return success
+    if not gps_raw_data.strip(): log_missing_gps_output(stderr, log_callback); return False
+    return write_gpx_from_exiftool_rows(gps_raw_data, output_gpx_path, log_callback)
+
+def extract_gpx_batch(exiftool_path: str, items, workers: int = 4, log_callback=None, catalog=None, native: bool = False) -> dict:
+    """ Extracts GPX for many (video_path, output_gpx_path) pairs over `workers` pooled ExifTool sessions. """
+    pool = get_exiftool_pool(exiftool_path, workers); results = {}; in_flight = {}
+    items = deque(items)
+    while items or in_flight:
+        # Keep each session busy with one queued request without opening the whole batch at once.
+        while items and len(in_flight) < workers * 2:
+            video_path, output_gpx_path = items.popleft()
+            if log_callback: log_callback(f"[*] Starting proven GPX extraction for: {os.path.basename(video_path)}")
+            try: writer = GPXStreamWriter(output_gpx_path)
+            except OSError as e:
+                if log_callback: log_callback(f"[!] ERROR: Cannot write {output_gpx_path}: {e}", "error")
+                results[video_path] = False; continue
+            in_flight[submit_gps_query(pool, video_path, writer.add_row, native)] = (video_path, writer)
+        if not in_flight: continue
+        done, _ = wait_futures(in_flight, return_when=FIRST_COMPLETED)
+        for future in done:
+            video_path, writer = in_flight.pop(future)
+            try:
+                stderr = future.result()[1]; results[video_path] = finish_gpx_stream(writer, stderr, log_callback)
+                if catalog and (results[video_path] or not (writer.rows_seen or stderr.strip())): catalog.record_gps(video_path, writer.first_time, writer.last_time, writer.point_count)
+            except Exception as e:
+                writer.abort()
+                if log_callback: log_callback(f"[!] ERROR: ExifTool failed for {os.path.basename(video_path)}: {e}", "error")
+                results[video_path] = False
+    return results
+
+# --- Insta360 Trailer GPS ---
+
+INSV_TRAILER_MAGIC = b"8db42d694ccc418790edff439fe026bf"
+INSV_FOOTER_SIZE = 78        # ends with the magic; starts with the header of the last record
+INSV_GPS_RECORD = 0x700
+INSV_RECORD_HEADER = struct.Struct("<HI")  # record id, data length; stored right after the record's data
+# unix time, (unknown), milliseconds, fix 'A'/'V', latitude, 'N'/'S', longitude, 'E'/'W', speed m/s, track, altitude
+INSV_GPS_SAMPLE = struct.Struct("<IIHcdcdcddd")
+
+INSV_GPS_CHUNK_SAMPLES = 4096  # fixes decoded per read, so memory stays flat however long the track is
+
+def _insv_gps_chunks(f, records):
+    """ The (start, length) GPS records of an open .insv file as runs of whole samples, in file order. """
+    for start, length in records:
+        length -= length % INSV_GPS_SAMPLE.size
+        for offset in range(start, start + length, INSV_GPS_CHUNK_SAMPLES * INSV_GPS_SAMPLE.size):
+            f.seek(offset); size = min(INSV_GPS_CHUNK_SAMPLES * INSV_GPS_SAMPLE.size, start + length - offset); data = f.read(size)
+            if len(data) != size: raise EOFError(f"{f.name} is truncated")
+            yield data
+
+def _insv_gps_layout_known(data: bytes) -> bool:
+    # Byte offsets of the fix flag and the hemisphere refs in INSV_GPS_SAMPLE; void fixes may carry anything there.
+    step = INSV_GPS_SAMPLE.size
+    return all(lat_ref in b"NS" and lon_ref in b"EWO" for fix, lat_ref, lon_ref in zip(data[10::step], data[19::step], data[28::step]) if fix == ord("A"))
+
+def read_insv_gps_rows(video_path: str):
+    """ The `time,lat,lon,alt` rows the ExifTool GPS query prints, decoded straight from the metadata trailer Insta360 appends to .insv files.
+
+    Only the footer and the GPS records are read, with a handful of seeks from the end of the file, never the video itself.
+    Returns None when there is no trailer, no GPS record, or anything this reader does not recognize, so callers can fall back to ExifTool;
+    otherwise a generator that decodes the rows a chunk at a time as they are consumed.
+    """
+    try:
+        with open(video_path, "rb") as f:
+            file_size = f.seek(0, os.SEEK_END)
+            if file_size < INSV_FOOTER_SIZE: return None
+            f.seek(file_size - INSV_FOOTER_SIZE); footer = f.read(INSV_FOOTER_SIZE)
+            if len(footer) != INSV_FOOTER_SIZE or footer[-32:] != INSV_TRAILER_MAGIC: return None
+            trailer_start = file_size - struct.unpack_from("<I", footer, 38)[0]
+            if trailer_start < 0: return None
+            # Walk the records from last to first, as ExifTool does; GPS records are emitted in file order.
+            header, end, gps_records = footer[:INSV_RECORD_HEADER.size], file_size - INSV_FOOTER_SIZE, []
+            while True:
+                record_id, length = INSV_RECORD_HEADER.unpack(header); start = end - length
+                if start < trailer_start: break
+                if record_id == INSV_GPS_RECORD: gps_records.append((start, length))
+                end = start - INSV_RECORD_HEADER.size
+                if end < trailer_start: break
+                f.seek(end); header = f.read(INSV_RECORD_HEADER.size)
+            gps_records.reverse()
+            # Check every fix up front: once rows are handed out, there is no falling back to ExifTool.
+            if not gps_records or not all(_insv_gps_layout_known(data) for data in _insv_gps_chunks(f, gps_records)): return None
+    except (OSError, EOFError, struct.error): return None
+    return _decode_insv_gps_rows(video_path, gps_records)
+
+def _decode_insv_gps_rows(video_path: str, gps_records):
+    with open(video_path, "rb") as f:
+        for data in _insv_gps_chunks(f, gps_records):
+            for seconds, _, _, fix, lat, lat_ref, lon, lon_ref, _, _, alt in INSV_GPS_SAMPLE.iter_unpack(data):
+                if fix != b"A": continue  # no fix
+                # 'O' is a French "Ouest".
+                lat = -abs(lat) if lat_ref == b"S" else lat; lon = lon if lon_ref == b"E" else -abs(lon)
+                # ExifTool prints whole-second UTC times and numbers the way Perl stringifies them (%.15g).
+                yield f"{time.strftime(EXIFTOOL_TIME_FORMAT, time.gmtime(seconds))},{lat:.15g},{lon:.15g},{alt:.15g}\n"
+
+def submit_gps_query(pool: ExifToolPool, video_path: str, on_line, native: bool = False) -> Future:
+    """ pool.submit() of the GPS query. With `native`, the .insv trailer is decoded on a thread of its own, so several
+    clips are read in parallel, and ExifTool only runs when the built-in reader does not recognize the file. """
+    if not native: return pool.submit(GPS_EXIFTOOL_ARGS + [video_path], on_line)
+    future = Future()
+    def relay(inner: Future):
+        if inner.exception(): future.set_exception(inner.exception())
+        else: future.set_result(inner.result())
+    def read():
+        try:
+            rows = read_insv_gps_rows(video_path)
+            if rows is None: return pool.submit(GPS_EXIFTOOL_ARGS + [video_path], on_line).add_done_callback(relay)
+            for row in rows: on_line(row)
+        except Exception as e: future.set_exception(e)
+        else: future.set_result(("", ""))
+    threading.Thread(target=read, daemon=True).start()
+    return future
+
+# --- Streaming GPX Writer ---
+
+GPX_HEADER = ('<?xml version="1.0" encoding="UTF-8"?>\n<gpx xmlns="http://www.topografix.com/GPX/1/1" xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" '
+              'xsi:schemaLocation="http://www.topografix.com/GPX/1/1 http://www.topografix.com/GPX/1/1/gpx.xsd" version="1.1" creator="gpx.py -- https://github.com/tkrajina/gpxpy">\n  <trk>\n    <trkseg>')
+GPX_SEGMENT_BREAK = '\n    </trkseg>\n    <trkseg>'
+GPX_FOOTER = '\n    </trkseg>\n  </trk>\n</gpx>'
+EXIFTOOL_TIME_FORMAT = '%Y-%m-%dT%H:%M:%SZ'
+
+def gpx_float(value: float) -> str:
+    # Same rendering as gpxpy: repr(), with scientific notation (illegal in GPX) spelled out.
+    text = repr(value)
+    return text if 'e' not in text else format(value, '.10f').rstrip('0').rstrip('.')
+
+_valid_gps_dates = {}
+
+def gpx_time(time_str: str) -> str:
+    """ Validates an ExifTool `%Y-%m-%dT%H:%M:%SZ` timestamp and returns it as gpxpy would write it. """
+    if len(time_str) == 20 and time_str[10] == 'T' and time_str[13] == ':' and time_str[16] == ':' and time_str[19] == 'Z':
+        day = time_str[:10]; valid = _valid_gps_dates.get(day)
+        if valid is None:
+            try: valid = day[4] == day[7] == '-' and day.replace('-', '').isascii() and day.replace('-', '').isdigit() and bool(datetime.date(int(day[:4]), int(day[5:7]), int(day[8:])))
+            except ValueError: valid = False
+            _valid_gps_dates[day] = valid
+        hh, mm, ss = time_str[11:13], time_str[14:16], time_str[17:19]
+        # Canonical timestamps round-trip unchanged, so most rows never touch strptime.
+        if valid and (hh + mm + ss).isascii() and (hh + mm + ss).isdigit() and hh < '24' and mm < '60' and ss < '60': return time_str
+    return datetime.datetime.strptime(time_str, EXIFTOOL_TIME_FORMAT).replace(tzinfo=datetime.timezone.utc).isoformat().replace('+00:00', 'Z')
+
+class GPXStreamWriter:
+    """ Writes track points straight to disk with the same bytes gpxpy's `to_xml()` would produce.
+
+    Output goes to `<path>.part` and is renamed into place by `close()`, so memory stays flat and an
+    interrupted extraction never leaves a truncated GPX behind.
+    """
+    def __init__(self, output_path: str):
+        self.output_path = output_path; self.temp_path = output_path + ".part"
+        self.rows_seen = 0; self.point_count = 0; self._segment_points = 0; self._break_pending = False
+        self.first_time = None; self.last_time = None
+        self._file = open(self.temp_path, 'w', encoding='utf-8', buffering=1 << 20); self._file.write(GPX_HEADER)
+
+    def add_row(self, line: str) -> bool:
+        """ Adds one `time,lat,lon,alt` ExifTool row; malformed rows are skipped. """
+        if not line.strip(): return False
+        self.rows_seen += 1
+        parts = line.rstrip('\n').split(',')
+        if len(parts) != 4: return False
+        try: time_str = gpx_time(parts[0]); lat = float(parts[1]); lon = float(parts[2]); ele = float(parts[3])
+        except ValueError: return False
+        self.add_point(lat, lon, ele, time_str)
+        return True
+
+    def add_point(self, lat: float, lon: float, ele: float, time_str: str):
+        if self._break_pending: self._file.write(GPX_SEGMENT_BREAK); self._break_pending = False; self._segment_points = 0
+        self._file.write(f'\n      <trkpt lat="{gpx_float(lat) if lat else 0}" lon="{gpx_float(lon) if lon else 0}">\n        <ele>{gpx_float(ele)}</ele>\n        <time>{time_str}</time>\n      </trkpt>')
+        self.point_count += 1; self._segment_points += 1
+        if self.first_time is None: self.first_time = time_str
+        self.last_time = time_str
+
+    def new_segment(self):
+        """ Starts a new <trkseg> before the next point; empty segments are never written. """
+        self._break_pending = self._segment_points > 0
+
+    def close(self):
+        self._file.write(GPX_FOOTER); self._file.close(); os.replace(self.temp_path, self.output_path)
+
+    def abort(self):
+        self._file.close()
+        try: os.remove(self.temp_path)
+        except OSError: pass
+
+def finish_gpx_stream(writer: GPXStreamWriter, stderr: str = "", log_callback=None) -> bool:
+    if not writer.rows_seen: writer.abort(); log_missing_gps_output(stderr, log_callback); return False
+    if not writer.point_count:
+        writer.abort()
+        if log_callback: log_callback("[!] ERROR: No valid GPS points could be parsed.", "error")
+        return False
+    try: writer.close()
+    except Exception as e:
+        writer.abort()
+        if log_callback: log_callback(f"[!] ERROR: Failed to build GPX file: {e}", "error")
+        return False
+    if log_callback: log_callback(f"[+] Success! Created GPX file with {writer.point_count} track points at: {writer.output_path}", "success")
+    return True
+
+def write_gpx_from_exiftool_rows(gps_raw_data: str, output_gpx_path: str, log_callback=None) -> bool:
+    import gpxpy.gpx  # only this legacy in-memory path needs it
     try:
         gpx = gpxpy.gpx.GPX(); gpx_track = gpxpy.gpx.GPXTrack(); gpx.tracks.append(gpx_track); gpx_segment = gpxpy.gpx.GPXTrackSegment(); gpx_track.segments.append(gpx_segment)
         point_count = 0
@@ -65,24 +472,150 @@ def extract_gpx_using_proven_method(exiftool_path: str, video_path: str, output_
     except Exception as e:
         if log_callback: log_callback(f"[!] ERROR: Failed to build GPX file: {e}", "error"); return False
 
-def get_video_resolution(file_path: str, log_callback=None):
+# --- Multi-Clip GPS Merge ---
+
+GPX_GAP_SECONDS = 30  # a longer pause between samples starts a new <trkseg>
+
+class GPSSpool:
+    """ Validated `time,lat,lon,alt` rows of one clip on disk, split into time-sorted runs for the merge. """
+    def __init__(self, folder: str, clip_index: int):
+        self.folder = folder; self.clip_index = clip_index; self.runs = []; self._file = None; self._last_time = None
+        self.rows_seen = 0; self.point_count = 0; self.first_time = None; self.last_time = None
+
+    def add_row(self, line: str):
+        if not line.strip(): return
+        self.rows_seen += 1
+        parts = line.rstrip('\n').split(',')
+        if len(parts) != 4: return
+        try: time_str = gpx_time(parts[0]); float(parts[1]); float(parts[2]); float(parts[3])
+        except ValueError: return
+        if self._file is None or time_str < self._last_time:
+            # ExifTool normally reports samples in order; anything else just becomes one more sorted run.
+            if self._file: self._file.close()
+            self.runs.append(os.path.join(self.folder, f"{self.clip_index:05d}-{len(self.runs):03d}.csv"))
+            self._file = open(self.runs[-1], 'w', encoding='utf-8', buffering=1 << 20)
+        self._file.write(f"{time_str},{parts[1]},{parts[2]},{parts[3]}\n")
+        self._last_time = time_str; self.point_count += 1
+        if self.first_time is None or time_str < self.first_time: self.first_time = time_str
+        if self.last_time is None or time_str > self.last_time: self.last_time = time_str
+
+    def close(self):
+        if self._file: self._file.close(); self._file = None
+
+def _read_spool_run(path: str, clip_index: int):
+    with open(path, 'r', encoding='utf-8', buffering=1 << 20) as f:
+        for line in f: yield line.rstrip('\n').split(',') + [clip_index]
+
+def _gps_epoch(time_str: str) -> int:
+    return calendar.timegm((int(time_str[:4]), int(time_str[5:7]), int(time_str[8:10]), int(time_str[11:13]), int(time_str[14:16]), int(time_str[17:19]), 0, 0, 0))
+
+def merge_gps_spools(spools, writer: GPXStreamWriter, gap_seconds: float = GPX_GAP_SECONDS) -> dict:
+    """ k-way merges the spooled runs by timestamp into `writer`, one row in memory per run.
+
+    Samples repeated at clip boundaries (same time and position in another clip) are written once, and a
+    pause longer than `gap_seconds` starts a new track segment.
+    """
+    runs = [_read_spool_run(path, spool.clip_index) for spool in spools for path in spool.runs]
+    duplicates = 0; segments = 0; current_time = None; current_epoch = None; seen_this_second = {}
+    for time_str, lat, lon, ele, clip_index in heapq.merge(*runs, key=lambda row: row[0]):
+        if time_str != current_time:
+            epoch = _gps_epoch(time_str)
+            if current_epoch is None or epoch - current_epoch > gap_seconds:
+                if current_epoch is not None: writer.new_segment()
+                segments += 1
+            current_time = time_str; current_epoch = epoch; seen_this_second.clear()
+        # $gpsdatetime has whole seconds, so several distinct samples share a timestamp; only exact repeats from
+        # another clip are dropped, since a camera standing still repeats fixes within one clip too.
+        sample = (lat, lon, ele)
+        if seen_this_second.setdefault(sample, clip_index) != clip_index: duplicates += 1; continue
+        writer.add_point(float(lat), float(lon), float(ele), time_str)
+    return {"points": writer.point_count, "duplicates": duplicates, "segments": segments}
+
+def extract_merged_gpx(exiftool_path: str, video_paths, output_gpx_path: str, workers: int = 4, gap_seconds: float = GPX_GAP_SECONDS, log_callback=None, catalog=None, native: bool = False) -> bool:
+    """ Extracts GPS from many clips in parallel and writes one time-ordered GPX track for all of them. """
+    video_paths = list(video_paths)
+    if not video_paths:
+        if log_callback: log_callback("[!] ERROR: No clips to merge.", "error")
+        return False
+    if log_callback: log_callback(f"[*] Extracting GPS from {len(video_paths)} clips with {workers} ExifTool sessions...")
+    pool = get_exiftool_pool(exiftool_path, workers); started = time.monotonic()
+    # Samples are spooled next to the output, so an unwritable folder shows up here before any ExifTool work.
+    try: spool_root = tempfile.TemporaryDirectory(prefix=".vision360-gps-", dir=os.path.dirname(os.path.abspath(output_gpx_path)))
+    except OSError as e:
+        if log_callback: log_callback(f"[!] ERROR: Cannot write {output_gpx_path}: {e}", "error")
+        return False
+    with spool_root as spool_dir:
+        spools = [GPSSpool(spool_dir, i) for i in range(len(video_paths))]
+        pending = deque(zip(video_paths, spools)); in_flight = {}
+        while pending or in_flight:
+            while pending and len(in_flight) < workers * 2:
+                video_path, spool = pending.popleft()
+                in_flight[submit_gps_query(pool, video_path, spool.add_row, native)] = (video_path, spool)
+            done, _ = wait_futures(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                video_path, spool = in_flight.pop(future); spool.close()
+                try: stderr = future.result()[1]
+                except Exception as e: stderr = str(e)
+                if not spool.point_count:
+                    if log_callback: log_callback(f"[-] {os.path.basename(video_path)}: no GPS data{': ' + stderr.strip().splitlines()[0] if stderr.strip() else ''}", "error")
+                elif log_callback: log_callback(f"    {os.path.basename(video_path)}: {spool.point_count} samples, {spool.first_time} to {spool.last_time}")
+                if catalog and not stderr.strip(): catalog.record_gps(video_path, spool.first_time, spool.last_time, spool.point_count)
+        if not any(spool.point_count for spool in spools):
+            if log_callback: log_callback("[!] ERROR: None of the clips contained GPS data.", "error")
+            return False
+        writer = None
+        try: writer = GPXStreamWriter(output_gpx_path); stats = merge_gps_spools(spools, writer, gap_seconds); writer.close()
+        except Exception as e:
+            if writer: writer.abort()
+            if log_callback: log_callback(f"[!] ERROR: Failed to build merged GPX file: {e}", "error")
+            return False
+    if log_callback: log_callback(f"[+] Success! Merged {sum(1 for s in spools if s.point_count)} clips into {stats['points']} track points in {stats['segments']} segment(s) "
+                                  f"({stats['duplicates']} duplicate samples dropped) in {time.monotonic() - started:.1f}s: {output_gpx_path}", "success")
+    return True
+
+def get_video_resolution(file_path: str, log_callback=None, catalog=None):
+    if catalog is not None:
+        info = catalog.probe(file_path, log_callback=log_callback)
+        return (info["width"], info["height"]) if info and info["width"] else None
     ffprobe_path = find_executable("ffprobe")
     if not ffprobe_path:
         if log_callback: log_callback("[-] Warning: 'ffprobe' not found.", "error"); return None
     command = [ffprobe_path, "-v", "error", "-select_streams", "v:0", "-show_entries", "stream=width,height", "-of", "json", file_path]
     try:
         result = subprocess.run(command, capture_output=True, text=True, check=True)
-        return json.loads(result.stdout)["streams"][0]["width"], json.loads(result.stdout)["streams"][0]["height"]
+        stream = json.loads(result.stdout)["streams"][0]
+        return stream["width"], stream["height"]
     except Exception as e:
         if log_callback: log_callback(f"[!] Could not get video resolution: {e}", "error"); return None
 
-def convert_video_with_sdk(sdk_path: str, model_dir: str, video_path: str, output_path: str, resolution: str, stitcher_model: str, enhancements: dict, log_callback=None):
-    if log_callback: log_callback(f"\n[*] Starting video conversion for: {os.path.basename(video_path)}")
+RESOLUTION_WIDTHS = {"8K": 7680, "5.7K": 5760, "4K": 3840, "3K": 3008}
+ENHANCEMENT_MAP = {'ColorPlus': {'pattern': 'colorplus_model*.ins', 'params': ["-enable_colorplus", "ON", "-colorplus_model"]},'AI Denoise': {'pattern': 'jpg_denoise*.ins', 'params': ["-enable_denoise", "ON", "-image_denoise_model"]},'Deflicker': {'pattern': 'deflicker*.ins', 'params': ["-enable_deflicker", "ON", "-deflicker_model"]},'Defringe HR': {'pattern': 'defringe_hr*.ins', 'params': ["-enable_defringe", "ON", "-hr_defringe_model"]},'Defringe LR': {'pattern': 'defringe_lr*.ins', 'params': ["-enable_defringe", "ON", "-lr_defringe_model"]},}
+
+def default_model_dir(sdk_path: str):
+    return os.path.join(os.path.dirname(sdk_path), "modelfile") if sdk_path else None
+
+def discover_models(model_dir: str):
+    """ Returns (stitcher model file names, {enhancement: (model file, SDK params)}) found in `model_dir`. """
+    if not (model_dir and os.path.isdir(model_dir)): return [], {}
+    stitchers = [os.path.basename(f) for f in glob(os.path.join(model_dir, 'ai_stitcher*.ins'))]; found = {}
+    for name, data in ENHANCEMENT_MAP.items():
+        matches = glob(os.path.join(model_dir, data['pattern']))
+        if matches: found[name] = (os.path.basename(matches[0]), data['params'])
+    return stitchers, found
+
+def available_resolutions(resolution) -> list:
+    """ Output resolutions worth offering for a clip of `resolution` (width, height), largest first. """
+    if not resolution: return ["5.7K", "4K", "3K"]
+    return [res for res, w in RESOLUTION_WIDTHS.items() if resolution[0] >= w] or ["4K"]
+
+def convert_video_with_sdk(sdk_path: str, model_dir: str, video_path: str, output_path: str, resolution: str, stitcher_model: str, enhancements: dict, log_callback=None, extra_inputs=()):
+    """ Starts the SDK; `extra_inputs` carries the second lens file of cameras that record one .insv per lens. """
+    if log_callback: log_callback(f"\n[*] Starting video conversion for: {' + '.join(os.path.basename(p) for p in (video_path, *extra_inputs))}")
     resolutions_map = {"8K": (7680, 3840), "5.7K": (5760, 2880), "4K": (3840, 1920), "3K": (3008, 1504)}
     try: width, height = resolutions_map[resolution]; output_size_str = f"{width}x{height}"
     except KeyError:
         if log_callback: log_callback(f"[!] ERROR: Invalid resolution '{resolution}'.", "error"); return None
-    command = [sdk_path, "-inputs", video_path, "-output", output_path, "-output_size", output_size_str, "-stitch_type", "aistitch", "-ai_stitching_model", os.path.join(model_dir, stitcher_model), "-enable_flowstate", "ON", "-disable_cuda", "true", "-enable_soft_decode", "true", "-enable_soft_encode", "true"]
+    command = [sdk_path, "-inputs", video_path, *extra_inputs, "-output", output_path, "-output_size", output_size_str, "-stitch_type", "aistitch", "-ai_stitching_model", os.path.join(model_dir, stitcher_model), "-enable_flowstate", "ON", "-disable_cuda", "true", "-enable_soft_decode", "true", "-enable_soft_encode", "true"]
     active_enhancements = []
     for key, (model_file, params) in enhancements.items():
         command.extend(params); command.append(os.path.join(model_dir, model_file)); active_enhancements.append(key.replace("_", " ").title())
@@ -94,281 +627,883 @@ def convert_video_with_sdk(sdk_path: str, model_dir: str, video_path: str, outpu
     except Exception as e:
         if log_callback: log_callback(f"\n[!] ERROR: Failed to start process: {e}", "error"); return None
 
-# --- GUI Application ---
+# --- Media Metadata Catalog ---
+
+def default_cache_dir() -> str:
+    path = os.path.join(os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"), "vision360")
+    os.makedirs(path, exist_ok=True)
+    return path
+
+MEDIA_FIELDS = ("path", "size", "mtime_ns", "width", "height", "duration", "codec", "has_gps", "gps_start", "gps_end", "gps_points")
+
+def probe_video_stream(ffprobe_path: str, file_path: str) -> dict:
+    """ Resolution, codec and duration from a single ffprobe run. """
+    command = [ffprobe_path, "-v", "error", "-select_streams", "v:0", "-show_entries", "stream=width,height,codec_name:format=duration", "-of", "json", file_path]
+    probe = json.loads(subprocess.run(command, capture_output=True, text=True, check=True).stdout)
+    stream = (probe.get("streams") or [{}])[0]; duration = probe.get("format", {}).get("duration")
+    return {"width": stream.get("width"), "height": stream.get("height"), "codec": stream.get("codec_name"), "duration": float(duration) if duration else None}
+
+def probe_gps_span(exiftool_path: str, file_path: str, pool: "ExifToolPool" = None, native: bool = False) -> dict:
+    """ Whether the file carries GPS samples, and the first/last sample time. """
+    span = {"has_gps": 0, "gps_start": None, "gps_end": None, "gps_points": 0}
+    def collect(line):
+        time_str = line.strip()
+        if not time_str: return
+        span["has_gps"] = 1; span["gps_points"] += 1
+        if span["gps_start"] is None or time_str < span["gps_start"]: span["gps_start"] = time_str
+        if span["gps_end"] is None or time_str > span["gps_end"]: span["gps_end"] = time_str
+    rows = read_insv_gps_rows(file_path) if native else None
+    if rows is not None:
+        for row in rows: collect(row.split(",", 1)[0])
+    else:
+        stderr = (pool or get_exiftool_pool(exiftool_path)).submit(["-ee", "-p", "$gpsdatetime", "-d", "%Y-%m-%dT%H:%M:%SZ", file_path], collect).result()[1]
+        # Without samples, an error means "unknown", not "no GPS": it must not end up in the catalog as has_gps=0.
+        if stderr.strip() and not span["has_gps"]: raise ExifToolError(stderr.strip().splitlines()[0])
+    return span
+
+class MediaCatalog:
+    """ Probe results for media files in SQLite, keyed by absolute path and only valid while size and mtime match. """
+    def __init__(self, path: str, ffprobe_path: str = None, exiftool_path: str = None, native_gps: bool = False):
+        self.path = path; self.ffprobe_path = ffprobe_path; self.exiftool_path = exiftool_path; self.native_gps = native_gps
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL"); self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS media (path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, width INTEGER, height INTEGER, duration REAL, "
+                         "codec TEXT, has_gps INTEGER, gps_start TEXT, gps_end TEXT, gps_points INTEGER, probed_at REAL)")
+        self._db.commit()
+
+    @staticmethod
+    def _identity(file_path: str):
+        path = os.path.abspath(file_path); st = os.stat(path)
+        return path, st.st_size, st.st_mtime_ns
+
+    def lookup(self, file_path: str):
+        """ The cached record for `file_path`, or None if it was never probed or has changed since. """
+        try: path, size, mtime_ns = self._identity(file_path)
+        except OSError: return None
+        with self._lock:
+            row = self._db.execute(f"SELECT {', '.join(MEDIA_FIELDS)} FROM media WHERE path=?", (path,)).fetchone()
+            if row is None: return None
+            if row[1] != size or row[2] != mtime_ns:
+                self._db.execute("DELETE FROM media WHERE path=?", (path,)); self._db.commit(); return None
+        return dict(zip(MEDIA_FIELDS, row))
+
+    def _store(self, record: dict):
+        with self._lock:
+            self._db.execute(f"INSERT OR REPLACE INTO media ({', '.join(MEDIA_FIELDS)}, probed_at) VALUES ({', '.join('?' * (len(MEDIA_FIELDS) + 1))})",
+                             tuple(record.get(field) for field in MEDIA_FIELDS) + (time.time(),))
+            self._db.commit()
+
+    def probe(self, file_path: str, gps: bool = False, log_callback=None, exiftool_pool: "ExifToolPool" = None):
+        """ Returns the file's record, running ffprobe (and ExifTool with `gps`) only for what isn't cached yet. """
+        record = self.lookup(file_path)
+        if record and (not gps or record["has_gps"] is not None): return record
+        try: path, size, mtime_ns = self._identity(file_path)
+        except OSError as e:
+            if log_callback: log_callback(f"[!] Could not read {file_path}: {e}", "error")
+            return None
+        if record is None:
+            record = dict.fromkeys(MEDIA_FIELDS); record.update(path=path, size=size, mtime_ns=mtime_ns)
+            ffprobe_path = self.ffprobe_path or find_executable("ffprobe")
+            if not ffprobe_path:
+                if log_callback: log_callback("[-] Warning: 'ffprobe' not found.", "error")
+                return None
+            try: record.update(probe_video_stream(ffprobe_path, path))
+            except Exception as e:
+                if log_callback: log_callback(f"[!] Could not get video resolution: {e}", "error")
+                return None
+        exiftool_path = self.exiftool_path or find_executable("exiftool")
+        if gps and exiftool_path:
+            try: record.update(probe_gps_span(exiftool_path, path, exiftool_pool, self.native_gps))
+            except Exception as e:
+                if log_callback: log_callback(f"[!] Could not read GPS data from {os.path.basename(path)}: {e}", "error")
+        self._store(record)
+        return record
+
+    def record_gps(self, file_path: str, gps_start: str = None, gps_end: str = None, gps_points: int = 0):
+        """ Stores what a GPX extraction found out, so later probes need no ExifTool run. """
+        record = self.lookup(file_path)
+        if record is None:
+            try: path, size, mtime_ns = self._identity(file_path)
+            except OSError: return
+            record = dict.fromkeys(MEDIA_FIELDS); record.update(path=path, size=size, mtime_ns=mtime_ns)
+        record.update(has_gps=int(gps_points > 0), gps_start=gps_start, gps_end=gps_end, gps_points=gps_points)
+        self._store(record)
+
+    def probe_many(self, files, workers: int = 4, gps: bool = False, log_callback=None, progress_callback=None) -> list:
+        """ Probes `files` in parallel; returns their records in the same order, None where probing failed. """
+        files = list(files); records = [None] * len(files)
+        exiftool_path = self.exiftool_path or find_executable("exiftool")
+        pool = get_exiftool_pool(exiftool_path, workers) if gps and exiftool_path else None
+        done = [0]; lock = threading.Lock(); pending = deque(enumerate(files))
+        def worker():
+            while True:
+                with lock:
+                    if not pending: return
+                    index, file_path = pending.popleft()
+                records[index] = self.probe(file_path, gps=gps, log_callback=log_callback, exiftool_pool=pool)
+                with lock: done[0] += 1
+                if progress_callback: progress_callback(done[0], len(files))
+        threads = [threading.Thread(target=worker, daemon=True) for _ in range(max(1, min(workers, len(files))))]
+        for thread in threads: thread.start()
+        for thread in threads: thread.join()
+        return records
+
+    def index_folder(self, folder: str, patterns=("*.insv",), workers: int = 4, gps: bool = False, recursive: bool = False, log_callback=None, progress_callback=None) -> list:
+        """ Probes every matching file under `folder` in parallel; unchanged files come straight from the catalog. """
+        files = sorted({f for pattern in patterns for f in glob(os.path.join(folder, "**", pattern) if recursive else os.path.join(folder, pattern), recursive=recursive)})
+        return [record for record in self.probe_many(files, workers, gps, log_callback, progress_callback) if record]
+
+    def close(self):
+        with self._lock: self._db.close()
+
+# --- Log Pipeline ---
+
+LOG_BUFFER_LINES = 5000
+JOB_LOG_MAX_BYTES = 10 * 1024 * 1024
+JOB_LOG_BACKUPS = 3
+
+class LogBuffer:
+    """ Bounded ring buffer of (message, tag) lines. Producers on any thread append without touching the UI,
+    which drains it in batches; when it falls behind, the oldest lines are dropped and counted. """
+    def __init__(self, max_lines: int = LOG_BUFFER_LINES):
+        self._lines = deque(maxlen=max_lines); self._lock = threading.Lock(); self._dropped = 0
+
+    def append(self, message: str, tag=None):
+        with self._lock:
+            if len(self._lines) == self._lines.maxlen: self._dropped += 1
+            self._lines.append((message, tag))
+
+    __call__ = append  # usable directly as a log_callback
+
+    def drain(self):
+        """ Returns (lines, number dropped) since the last drain. """
+        with self._lock:
+            lines = list(self._lines); dropped = self._dropped
+            self._lines.clear(); self._dropped = 0
+        return lines, dropped
 
-class InstaToolApp:
-    def __init__(self, master):
-        self.master = master
-        
-        # <-- שינוי 3: טעינת והגדרת הלוגו כאייקון החלון -->
+    def clear(self):
+        self.drain()
+
+class RotatingLogFile:
+    """ Append-only text log that keeps `backups` older generations (`.1` newest) and rotates at `max_bytes`.
+    An existing log is rotated away on open, so each run starts a fresh file. """
+    def __init__(self, path: str, max_bytes: int = JOB_LOG_MAX_BYTES, backups: int = JOB_LOG_BACKUPS):
+        self.path = path; self.max_bytes = max_bytes; self.backups = backups; self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        if os.path.exists(path) and os.path.getsize(path): self._rotate()
+        self._file = open(path, "a", encoding="utf-8", buffering=64 * 1024); self._size = self._file.tell()
+
+    def _rotate(self):
+        for i in range(self.backups - 1, 0, -1):
+            if os.path.exists(f"{self.path}.{i}"): os.replace(f"{self.path}.{i}", f"{self.path}.{i + 1}")
+        if self.backups: os.replace(self.path, f"{self.path}.1")
+        else: os.remove(self.path)
+
+    def write(self, message: str, tag=None):
+        line = f"{time.strftime('%H:%M:%S')} {'[' + tag + '] ' if tag else ''}{message.strip(chr(10))}\n"; size = len(line.encode("utf-8"))
+        with self._lock:
+            if self._file is None: return
+            if self._size and self._size + size > self.max_bytes:
+                self._file.close(); self._rotate(); self._file = open(self.path, "a", encoding="utf-8", buffering=64 * 1024); self._size = 0
+            self._file.write(line); self._size += size
+
+    __call__ = write
+
+    def close(self):
+        with self._lock:
+            if self._file is not None: self._file.close(); self._file = None
+
+# --- Conversion Manifest ---
+
+MANIFEST_NAME = ".vision360-manifest.json"
+MANIFEST_FORMAT = 1  # bump when the SDK command line changes in ways that alter the output
+PARTIAL_HASH_BYTES = 1024 * 1024
+
+@functools.lru_cache(maxsize=1024)
+def _partial_digest(path: str, size: int, mtime_ns: int) -> str:
+    # size and mtime_ns only key the cache; a changed file gets hashed again.
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        digest.update(f.read(PARTIAL_HASH_BYTES))
+        if size > 2 * PARTIAL_HASH_BYTES: f.seek(size - PARTIAL_HASH_BYTES)
+        digest.update(f.read(PARTIAL_HASH_BYTES))
+    return digest.hexdigest()
+
+def file_fingerprint(path: str) -> dict:
+    """ Size plus a hash of the first and last MiB: cheap on multi-GB clips, and unlike mtime it survives copying an archive. """
+    st = os.stat(path)
+    return {"size": st.st_size, "hash": _partial_digest(os.path.abspath(path), st.st_size, st.st_mtime_ns)}
+
+def conversion_fingerprint(sdk_path: str, model_dir: str, input_path: str, resolution: str, stitcher_model: str, enhancements: dict, extra_inputs=()):
+    """ Returns (digest, settings) identifying what an SDK run would produce: input content, output settings, models and SDK build. """
+    settings = {"format": MANIFEST_FORMAT, "input": dict(file_fingerprint(input_path), name=os.path.basename(input_path)), "resolution": resolution,
+                "stitcher_model": dict(file_fingerprint(os.path.join(model_dir, stitcher_model)), file=stitcher_model),
+                "enhancements": {key: dict(file_fingerprint(os.path.join(model_dir, model_file)), file=model_file, params=list(params)) for key, (model_file, params) in sorted(enhancements.items())},
+                # The SDK has no version switch, so its binary stands in for the version.
+                "sdk": file_fingerprint(sdk_path)}
+    if extra_inputs: settings["extra_inputs"] = [dict(file_fingerprint(path), name=os.path.basename(path)) for path in extra_inputs]
+    return hashlib.sha256(json.dumps(settings, sort_keys=True).encode()).hexdigest(), settings
+
+class ConversionManifest:
+    """ Fingerprints of the outputs rendered into one folder, kept in `.vision360-manifest.json` and replaced atomically on every update. """
+    _lock = threading.Lock()  # shared: several queued jobs may finish into the same folder at once
+
+    def __init__(self, folder: str):
+        self.folder = folder; self.path = os.path.join(folder, MANIFEST_NAME)
+
+    def _load(self) -> dict:
         try:
-            # החלף את "logo.png" בשם המדויק של קובץ הלוגו שלך
-            logo_path = resource_path("logo.png") 
-            logo_image = tk.PhotoImage(file=logo_path)
-            master.iconphoto(True, logo_image)
-        except Exception as e:
-            print(f"Error loading application icon: {e}")
-        # <-- סוף קטע הקוד של הלוגו -->
-
-        master.title("Insta360 Toolbox")
-        master.geometry("900x800")
-        self.btc_address = "BC1QM2E6SE7FUE4WEPMXU2ASM47AS59WVX4WL6WRXW"
-        self.kofi_url = "https://ko-fi.com/pavelrst"
-        self.contact_email = "Pavelrzt@gmail.com"
-        self.sdk_path = find_executable("testSDKDemo"); self.exiftool_path = find_executable("exiftool")
-        self.model_dir = os.path.join(os.path.dirname(self.sdk_path), "modelfile") if self.sdk_path else None
-        self.input_file_var = tk.StringVar(); self.output_folder_var = tk.StringVar(); self.resolution_var = tk.StringVar(); self.stitcher_model_var = tk.StringVar()
-        self.ENHANCEMENT_MAP = {'ColorPlus': {'pattern': 'colorplus_model*.ins', 'params': ["-enable_colorplus", "ON", "-colorplus_model"]},'AI Denoise': {'pattern': 'jpg_denoise*.ins', 'params': ["-enable_denoise", "ON", "-image_denoise_model"]},'Deflicker': {'pattern': 'deflicker*.ins', 'params': ["-enable_deflicker", "ON", "-deflicker_model"]},'Defringe HR': {'pattern': 'defringe_hr*.ins', 'params': ["-enable_defringe", "ON", "-hr_defringe_model"]},'Defringe LR': {'pattern': 'defringe_lr*.ins', 'params': ["-enable_defringe", "ON", "-lr_defringe_model"]},}
-        self.enhancement_vars = {key: tk.BooleanVar() for key in self.ENHANCEMENT_MAP}
-        self.found_models = {}; self.available_stitcher_models = []
-        self.discover_models()
-        self.current_process = None
-        self.gpx_input_file_var = tk.StringVar(); self.gpx_output_file_var = tk.StringVar()
-        self.create_widgets()
-        self.check_executables()
-
-    def create_widgets(self):
-        main_frame = ttk.Frame(self.master, padding="10"); main_frame.pack(fill=tk.BOTH, expand=True)
-        main_frame.rowconfigure(0, weight=1); main_frame.columnconfigure(0, weight=1)
-        style = ttk.Style(self.master); style.theme_use('clam'); style.configure("blue.Horizontal.TProgressbar", troughcolor='#E0E0E0', background='#0078D7', thickness=20)
-        style.configure("Link.TLabel", foreground="blue", font=('TkDefaultFont', 10, 'underline'))
-        self.notebook = ttk.Notebook(main_frame); self.notebook.grid(row=0, column=0, sticky="nsew")
-        convert_tab = ttk.Frame(self.notebook, padding="10"); self.notebook.add(convert_tab, text="Convert to 360 MP4")
-        gpx_tab = ttk.Frame(self.notebook, padding="10"); self.notebook.add(gpx_tab, text="Extract GPX")
-        map_tab = ttk.Frame(self.notebook, padding="10"); self.notebook.add(map_tab, text="Map Viewer")
-        about_tab = ttk.Frame(self.notebook, padding="10"); self.notebook.add(about_tab, text="About")
-        self.create_conversion_tab(convert_tab)
-        self.create_gpx_tab(gpx_tab)
-        self.create_map_tab(map_tab)
-        self.create_about_tab(about_tab)
-        log_frame = ttk.LabelFrame(main_frame, text="Log Output"); log_frame.grid(row=1, column=0, sticky="ew", pady=(10,0))
-        self.log_text = scrolledtext.ScrolledText(log_frame, wrap=tk.WORD, height=8, font=("monospace", 9)); self.log_text.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
-        self.log_text.configure(state='disabled'); self.log_text.tag_config("error", foreground="#d9534f"); self.log_text.tag_config("success", foreground="#5cb85c")
-
-    def create_conversion_tab(self, tab):
-        # ... no changes ...
-        input_frame = ttk.LabelFrame(tab, text="1. Select Input File"); input_frame.pack(fill=tk.X, padx=5, pady=5)
-        ttk.Entry(input_frame, textvariable=self.input_file_var, state="readonly").pack(side=tk.LEFT, fill=tk.X, expand=True, padx=5, pady=5)
-        ttk.Button(input_frame, text="Browse...", command=self.select_convert_input_file).pack(side=tk.LEFT, padx=5, pady=5)
-        output_frame = ttk.LabelFrame(tab, text="2. Select Output Folder"); output_frame.pack(fill=tk.X, padx=5, pady=5)
-        ttk.Entry(output_frame, textvariable=self.output_folder_var, state="readonly").pack(side=tk.LEFT, fill=tk.X, expand=True, padx=5, pady=5)
-        ttk.Button(output_frame, text="Browse...", command=self.select_output_folder).pack(side=tk.LEFT, padx=5, pady=5)
-        options_frame = ttk.LabelFrame(tab, text="3. Conversion Options"); options_frame.pack(fill=tk.X, padx=5, pady=5)
-        res_frame = ttk.Frame(options_frame); res_frame.pack(fill=tk.X, padx=5, pady=2)
-        ttk.Label(res_frame, text="Output Resolution:", width=16).pack(side=tk.LEFT)
-        self.res_combobox = ttk.Combobox(res_frame, textvariable=self.resolution_var, state="disabled"); self.res_combobox.pack(side=tk.LEFT, fill=tk.X, expand=True)
-        stitcher_frame = ttk.Frame(options_frame); stitcher_frame.pack(fill=tk.X, padx=5, pady=2)
-        ttk.Label(stitcher_frame, text="Stitcher Model:", width=16).pack(side=tk.LEFT)
-        self.stitcher_combobox = ttk.Combobox(stitcher_frame, textvariable=self.stitcher_model_var, values=self.available_stitcher_models, state="disabled"); self.stitcher_combobox.pack(side=tk.LEFT, fill=tk.X, expand=True)
-        enhancements_frame = ttk.LabelFrame(tab, text="4. Enhancements"); enhancements_frame.pack(fill=tk.X, padx=5, pady=5)
-        self.enhancement_checkboxes = {}
-        for name in self.ENHANCEMENT_MAP.keys():
-            cb = ttk.Checkbutton(enhancements_frame, text=name, variable=self.enhancement_vars[name], state="disabled")
-            cb.pack(side=tk.LEFT, padx=10, pady=5); self.enhancement_checkboxes[name] = cb
-            if name in self.found_models: cb.config(state="normal")
-        control_frame = ttk.Frame(tab); control_frame.pack(fill=tk.X, padx=5, pady=10)
-        self.convert_button = ttk.Button(control_frame, text="Start Conversion", command=self.start_conversion_thread, state="disabled"); self.convert_button.pack(side=tk.LEFT, padx=5)
-        self.cancel_button = ttk.Button(control_frame, text="Cancel", command=self.cancel_conversion, state="disabled"); self.cancel_button.pack(side=tk.LEFT, padx=5)
-        progress_container = ttk.Frame(control_frame); progress_container.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=5)
-        self.progress_bar = ttk.Progressbar(progress_container, style="blue.Horizontal.TProgressbar"); self.progress_bar.pack(fill=tk.X, expand=True)
-        self.progress_label = ttk.Label(progress_container, text="0%", anchor="center", font=("Arial", 10, "bold"), background='#E0E0E0', foreground='black'); self.progress_label.place(relwidth=1.0, relheight=1.0)
-    
-    def create_gpx_tab(self, tab):
-        # ... no changes ...
-        gpx_input_frame = ttk.LabelFrame(tab, text="1. Select Input INSV File"); gpx_input_frame.pack(fill=tk.X, padx=5, pady=10)
-        ttk.Entry(gpx_input_frame, textvariable=self.gpx_input_file_var, state="readonly").pack(side=tk.LEFT, fill=tk.X, expand=True, padx=5, pady=5)
-        ttk.Button(gpx_input_frame, text="Browse...", command=self.select_gpx_input_file).pack(side=tk.LEFT, padx=5, pady=5)
-        gpx_output_frame = ttk.LabelFrame(tab, text="2. Select Output GPX File Path"); gpx_output_frame.pack(fill=tk.X, padx=5, pady=10)
-        ttk.Entry(gpx_output_frame, textvariable=self.gpx_output_file_var, state="readonly").pack(side=tk.LEFT, fill=tk.X, expand=True, padx=5, pady=5)
-        ttk.Button(gpx_output_frame, text="Browse...", command=self.select_gpx_output_file).pack(side=tk.LEFT, padx=5, pady=5)
-        gpx_control_frame = ttk.Frame(tab); gpx_control_frame.pack(fill=tk.X, padx=5, pady=20)
-        self.gpx_extract_button = ttk.Button(gpx_control_frame, text="Extract GPX", command=self.start_gpx_extraction_thread, state="disabled"); self.gpx_extract_button.pack()
-
-    def create_map_tab(self, tab):
-        # ... no changes ...
-        tab.rowconfigure(1, weight=1); tab.columnconfigure(0, weight=1)
-        self.tile_servers = {"Google Normal": "https://mt0.google.com/vt/lyrs=m&hl=en&x={x}&y={y}&z={z}&s=Ga", "Google Satellite": "https://mt0.google.com/vt/lyrs=s,h&hl=en&x={x}&y={y}&z={z}&s=Ga", "OpenStreetMap": "https://a.tile.openstreetmap.org/{z}/{x}/{y}.png"}
-        controls_frame = ttk.Frame(tab); controls_frame.grid(row=0, column=0, sticky="ew", pady=(0, 10))
-        ttk.Button(controls_frame, text="Load GPX File...", command=self.load_gpx_from_dialog).pack(side=tk.LEFT, padx=(0, 10))
-        ttk.Label(controls_frame, text="Map Type:").pack(side=tk.LEFT)
-        self.map_type_combo = ttk.Combobox(controls_frame, state="readonly", values=list(self.tile_servers.keys())); self.map_type_combo.pack(side=tk.LEFT); self.map_type_combo.set("OpenStreetMap"); self.map_type_combo.bind("<<ComboboxSelected>>", self.change_map_type)
-        self.map_widget = TkinterMapView(tab, corner_radius=0); self.map_widget.grid(row=1, column=0, sticky="nsew"); self.map_widget.set_tile_server(self.tile_servers[self.map_type_combo.get()]); self.map_widget.set_position(48.8566, 2.3522); self.map_widget.set_zoom(5)
-        
-    def create_about_tab(self, tab):
-        tab.columnconfigure(0, weight=1)
-        
-        # --- App Description ---
-        desc_frame = ttk.LabelFrame(tab, text="What is this thing anyway?", padding=15)
-        desc_frame.grid(row=0, column=0, sticky="ew", pady=10)
-        title_font = ('TkDefaultFont', 12, 'bold')
-        ttk.Label(desc_frame, text="Your Insta360 Desktop Workflow Hub", font=title_font).pack(anchor="w", pady=(0,10))
-        desc_text = "    This toolbox simplifies your workflow by combining the power of the official Insta360 SDK for flawless video conversion with the precision of the renowned ExifTool for GPS data extraction, all wrapped in one simple interface."
-        ttk.Label(desc_frame, text=desc_text, wraplength=700, justify="left").pack(anchor="w")
-
-        # --- Credits and Support ---
-        support_frame = ttk.LabelFrame(tab, text="Credits & Support", padding=15)
-        support_frame.grid(row=1, column=0, sticky="ew", pady=10)
-        
-        credit_text = "Vision and concept Lovingly crafted by Pavel Rosental.\nWith Help by his AI assistant, Gemini."
-        ttk.Label(support_frame, text=credit_text, font=('TkDefaultFont', 10, 'italic'), justify="left").pack(anchor="w", pady=(0, 15))
-
-        ttk.Label(support_frame, text="If this tool saved you time or a headache, consider fueling future development:", justify="left").pack(anchor="w", pady=(0, 10))
-
-        # Contact
-        contact_frame = ttk.Frame(support_frame)
-        contact_frame.pack(anchor="w", pady=5, padx=20)
-        ttk.Label(contact_frame, text=" • Contact: ").pack(side=tk.LEFT)
-        self.email_link = ttk.Label(contact_frame, text=self.contact_email, style="Link.TLabel", cursor="hand2")
-        self.email_link.pack(side=tk.LEFT)
-        self.email_link.bind("<Button-1>", lambda e: self.copy_to_clipboard(self.email_link, self.contact_email, "Email"))
-        
-        # Coffee (Ko-fi) link
-        kofi_frame = ttk.Frame(support_frame)
-        kofi_frame.pack(anchor="w", pady=5, padx=20)
-        ttk.Label(kofi_frame, text=" • Buy me a coffee at: ").pack(side=tk.LEFT)
-        self.kofi_link = ttk.Label(kofi_frame, text=self.kofi_url, style="Link.TLabel", cursor="hand2")
-        self.kofi_link.pack(side=tk.LEFT)
-        self.kofi_link.bind("<Button-1>", lambda e: self.copy_to_clipboard(self.kofi_link, self.kofi_url, "URL"))
-
-        # Bitcoin donations
-        btc_frame = ttk.Frame(support_frame)
-        btc_frame.pack(anchor="w", pady=5, padx=20)
-        ttk.Label(btc_frame, text=" • Bitcoin donations:").pack(anchor="w", pady=(5,2))
-        btc_addr_frame = ttk.Frame(btc_frame); btc_addr_frame.pack(anchor="w", pady=5)
-        btc_entry = ttk.Entry(btc_addr_frame, width=45); btc_entry.insert(0, self.btc_address); btc_entry.config(state="readonly"); btc_entry.pack(side=tk.LEFT)
-        self.copy_button = ttk.Button(btc_addr_frame, text="Copy", command=self.copy_btc_address, width=8); self.copy_button.pack(side=tk.LEFT, padx=5)
-
-    def copy_to_clipboard(self, widget, text_to_copy, item_name="Text"):
-        """Copies text to clipboard and provides feedback on a label widget."""
-        self.master.clipboard_clear()
-        self.master.clipboard_append(text_to_copy)
-        original_text = widget['text']
-        widget.config(text="Copied to clipboard!", style="")
-        self.master.after(2000, lambda: widget.config(text=original_text, style="Link.TLabel"))
-        self.log_message(f"{item_name} copied to clipboard!")
-
-    def copy_btc_address(self):
-        """Copies text to clipboard and provides feedback on the BTC button."""
-        self.master.clipboard_clear()
-        self.master.clipboard_append(self.btc_address)
-        original_text = self.copy_button['text']
-        self.copy_button.config(text="Copied!")
-        self.master.after(1500, lambda: self.copy_button.config(text=original_text))
-        self.log_message("BTC address copied to clipboard!")
-        
-    def change_map_type(self, event=None):
-        map_type = self.map_type_combo.get(); self.map_widget.set_tile_server(self.tile_servers[map_type]); self.log_message(f"Map type changed to {map_type}.")
-    def load_gpx_from_dialog(self):
-        file_path = filedialog.askopenfilename(title="Select GPX File", filetypes=[("GPX files", "*.gpx")])
-        if file_path: self.display_gpx_on_map(file_path)
-    def display_gpx_on_map(self, gpx_path):
-        self.log_message(f"Loading GPX path on map from: {os.path.basename(gpx_path)}")
+            with open(self.path, "r", encoding="utf-8") as f: data = json.load(f)
+            return data["outputs"] if data.get("format") == MANIFEST_FORMAT else {}
+        except (OSError, ValueError, KeyError, AttributeError): return {}
+
+    def _save(self, outputs: dict):
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f: json.dump({"format": MANIFEST_FORMAT, "outputs": outputs}, f, indent=1, sort_keys=True)
+        os.replace(tmp_path, self.path)
+
+    def is_up_to_date(self, output_path: str, fingerprint: str) -> bool:
+        with self._lock: entry = self._load().get(os.path.basename(output_path))
+        if not entry or entry.get("fingerprint") != fingerprint: return False
+        try: st = os.stat(output_path)
+        except OSError: return False
+        if st.st_size != entry.get("output_size"): return False
+        # A copied or restored folder gets new mtimes; the partial hash tells whether it still holds the same render.
+        if st.st_mtime_ns == entry.get("output_mtime_ns"): return True
+        try: return entry.get("output_hash") == file_fingerprint(output_path)["hash"]
+        except OSError: return False
+
+    def record(self, output_path: str, fingerprint: str, settings: dict):
+        st = os.stat(output_path); output_hash = file_fingerprint(output_path)["hash"]
+        with self._lock:
+            outputs = self._load()
+            outputs[os.path.basename(output_path)] = {"fingerprint": fingerprint, "input": settings["input"]["name"], "settings": settings, "output_size": st.st_size,
+                                                      "output_mtime_ns": st.st_mtime_ns, "output_hash": output_hash, "rendered_at": time.strftime("%Y-%m-%dT%H:%M:%S")}
+            self._save(outputs)
+
+def partial_output_path(output_path: str) -> str:
+    """ Where the SDK renders before the result is renamed into place; keeps the .mp4 extension the SDK expects. """
+    folder, name = os.path.split(output_path)
+    return os.path.join(folder, f".{os.path.splitext(name)[0]}.partial.mp4")
+
+# --- Batch Conversion Queue ---
+
+SDK_PROGRESS_RE = re.compile(r"process\s*=\s*(\d+)\s*%")
+
+def default_conversion_workers() -> int:
+    # Each SDK process already spreads software decode/encode over several cores.
+    return max(1, (os.cpu_count() or 1) // 8)
+
+def conversion_output_path(input_file: str, output_folder: str, resolution: str) -> str:
+    return os.path.join(output_folder, f"{os.path.splitext(os.path.basename(input_file))[0]}_{resolution}_360.mp4")
+
+class ConversionJob:
+    """ A single queued SDK conversion with its own output settings. """
+    def __init__(self, job_id: int, input_path: str, output_path: str, resolution: str, stitcher_model: str, enhancements: dict, force: bool = False, extra_inputs=(), tag=None):
+        self.job_id = job_id; self.input_path = input_path; self.output_path = output_path; self.force = force; self.extra_inputs = tuple(extra_inputs)
+        self.tag = tag  # the submitter's own reference, e.g. the ingest task the job belongs to
+        self.resolution = resolution; self.stitcher_model = stitcher_model; self.enhancements = dict(enhancements)
+        self.state = "queued"; self.progress = 0; self.returncode = None
+        self.process = None; self.cancelled = False; self.log_path = None
+        self.input_size = sum(os.path.getsize(path) for path in (input_path, *self.extra_inputs) if os.path.isfile(path))
+        self.started_at = None; self.finished_at = None; self.fingerprint = None; self.settings = None
+
+    @property
+    def name(self) -> str: return os.path.basename(self.input_path)
+
+    @property
+    def finished(self) -> bool: return self.state in ("done", "skipped", "failed", "cancelled")
+
+    @property
+    def elapsed(self) -> float:
+        if self.started_at is None: return 0.0
+        return (self.finished_at or time.monotonic()) - self.started_at
+
+class ConversionQueue:
+    """ Runs queued conversions through a bounded pool of concurrent SDK processes. """
+    def __init__(self, sdk_path: str, model_dir: str, max_workers: int = None, log_callback=None, job_callback=None, batch_callback=None, log_dir: str = None):
+        self.sdk_path = sdk_path; self.model_dir = model_dir; self.log_dir = log_dir
+        self.max_workers = max(1, max_workers or default_conversion_workers())
+        self.log_callback = log_callback; self.job_callback = job_callback; self.batch_callback = batch_callback
+        self.jobs = []; self._pending = deque(); self._running_workers = 0; self._next_id = 1
+        self._batch_started = None; self._batch_holds = 0; self._cond = threading.Condition()
+
+    def submit(self, input_path: str, output_folder: str, resolution: str, stitcher_model: str, enhancements: dict, output_path: str = None, force: bool = False, extra_inputs=(), tag=None) -> ConversionJob:
+        """ Queues a conversion; unless `force`, it is skipped when the folder's manifest shows the output is already up to date.
+
+        `tag` is stored on the job before it can start, so job_callback can map even an instantly finished job back to its origin.
+        """
+        with self._cond:
+            # A new batch starts only once the previous one was reported, so no job is dropped before its stats went out.
+            if self._batch_started is None: self.jobs = []; self._batch_started = time.monotonic()
+            job = ConversionJob(self._next_id, input_path, output_path or conversion_output_path(input_path, output_folder, resolution), resolution, stitcher_model, enhancements, force, extra_inputs, tag)
+            self._next_id += 1; self.jobs.append(job); self._pending.append(job)
+            self._spawn_workers()
+        self._notify(job)
+        return job
+
+    @contextlib.contextmanager
+    def batch(self):
+        """ Groups the submits made inside into one batch, reported by `batch_callback` only after the block ends,
+        even when jobs that are already up to date finish before the next one is queued. """
+        with self._cond: self._batch_holds += 1
+        try: yield self
+        finally:
+            with self._cond: self._batch_holds -= 1
+            self._check_batch_done()
+
+    def set_max_workers(self, max_workers: int):
+        with self._cond: self.max_workers = max(1, int(max_workers)); self._spawn_workers()
+
+    def cancel(self, job: ConversionJob):
+        with self._cond:
+            if job.finished: return
+            job.cancelled = True
+            if job.state == "queued":
+                self._pending.remove(job); job.state = "cancelled"; job.finished_at = time.monotonic()
+        if job.state == "cancelled": self._notify(job); self._check_batch_done()
+        elif job.process:
+            if self.log_callback: self.log_callback(f"\n[!] Cancelling {job.name}. Terminating...", "error")
+            job.process.terminate()
+
+    def cancel_all(self):
+        for job in list(self.jobs): self.cancel(job)
+
+    def is_idle(self) -> bool:
+        return not self._pending and self._running_workers == 0
+
+    def wait(self, timeout: float = None) -> bool:
+        with self._cond: return self._cond.wait_for(self.is_idle, timeout)
+
+    def overall_progress(self) -> int:
+        jobs = list(self.jobs)
+        if not jobs: return 0
+        return int(sum(100 if j.finished else j.progress for j in jobs) / len(jobs))
+
+    def stats(self) -> dict:
+        jobs = list(self.jobs); done = [j for j in jobs if j.state == "done"]
+        elapsed = (time.monotonic() - self._batch_started) if self._batch_started else 0.0
+        input_bytes = sum(j.input_size for j in done)
+        return {"total": len(jobs), "done": len(done), "skipped": sum(j.state == "skipped" for j in jobs), "failed": sum(j.state == "failed" for j in jobs), "cancelled": sum(j.state == "cancelled" for j in jobs),
+                "running": sum(j.state == "running" for j in jobs), "queued": sum(j.state == "queued" for j in jobs), "elapsed": elapsed,
+                "clips_per_hour": len(done) * 3600.0 / elapsed if elapsed else 0.0, "input_mb_per_s": input_bytes / 1e6 / elapsed if elapsed else 0.0}
+
+    def _spawn_workers(self):
+        while self._running_workers < min(self.max_workers, len(self._pending)):
+            self._running_workers += 1; threading.Thread(target=self._worker, daemon=True).start()
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                if not self._pending or self._running_workers > self.max_workers:
+                    self._running_workers -= 1; self._cond.notify_all(); break
+                job = self._pending.popleft(); job.state = "running"; job.started_at = time.monotonic()
+            self._notify(job)
+            try: self._run_job(job)
+            except Exception as e:
+                job.state = "failed"
+                if self.log_callback: self.log_callback(f"[!] ERROR: Conversion of {job.name} crashed: {e}", "error")
+            job.finished_at = time.monotonic(); job.process = None
+            self._notify(job)
+        self._check_batch_done()
+
+    def _run_job(self, job: ConversionJob):
+        log = self._job_logger(job); log_file = None
+        manifest = ConversionManifest(os.path.dirname(job.output_path) or ".")
+        try: job.fingerprint, job.settings = conversion_fingerprint(self.sdk_path, self.model_dir, job.input_path, job.resolution, job.stitcher_model, job.enhancements, job.extra_inputs)
+        except OSError as e:
+            job.state = "failed"
+            if log: log(f"[!] ERROR: Cannot read {e.filename}: {e.strerror}", "error")
+            return
+        if not job.force and manifest.is_up_to_date(job.output_path, job.fingerprint):
+            job.state = "skipped"; job.progress = 100
+            if log: log(f"[=] {os.path.basename(job.output_path)} is up to date, skipping.")
+            return
+        if self.log_dir:
+            job.log_path = os.path.join(self.log_dir, os.path.splitext(os.path.basename(job.output_path))[0] + ".log")
+            try: log_file = RotatingLogFile(job.log_path)
+            except OSError as e:
+                job.log_path = None
+                if log: log(f"[-] Warning: cannot write job log: {e}", "error")
+        if not log_file: return self._run_sdk(job, log)
+        ui_log = log
+        def log(message, tag=None):
+            log_file.write(message, tag)
+            if ui_log: ui_log(message, tag)
+        try: self._run_sdk(job, log, log_file)
+        finally:
+            log_file.close()
+            if ui_log: ui_log(f"    Full log: {job.log_path}")
+
+    def _run_sdk(self, job: ConversionJob, log, log_file: RotatingLogFile = None):
+        # Render under a temporary name and rename on success, so an interrupted run never leaves a complete-looking output.
+        partial_path = partial_output_path(job.output_path)
         try:
-            with open(gpx_path, 'r', encoding='utf-8') as f: gpx = gpxpy.parse(f)
-            points = [(p.latitude, p.longitude) for t in gpx.tracks for s in t.segments for p in s.points]
-            if not points: messagebox.showwarning("No Points", "The selected GPX file contains no track points to display."); return
-            self.map_widget.delete_all_path()
-            self.map_widget.set_path(points, color="#FF0000", width=3)
-            bounds = gpx.get_bounds()
-            if bounds:
-                top_left = (bounds.max_latitude, bounds.min_longitude)
-                bottom_right = (bounds.min_latitude, bounds.max_longitude)
-                self.map_widget.fit_bounding_box(top_left, bottom_right)
-            self.log_message(f"Successfully displayed {len(points)} points on the map.")
-            self.notebook.select(2)
-        except Exception as e:
-            self.log_message(f"ERROR loading GPX on map: {e}", "error")
-            messagebox.showerror("GPX Error", f"Could not load or parse the GPX file.\n\nDetails: {e}")
-    def run_gpx_extraction(self):
-        input_file, output_file = self.gpx_input_file_var.get(), self.gpx_output_file_var.get()
-        success = extract_gpx_using_proven_method(self.exiftool_path, input_file, output_file, self.log_message)
-        if success: self.master.after(0, self.display_gpx_on_map, output_file)
-        self.master.after(0, self.check_gpx_inputs)
-    def discover_models(self):
-        if not (self.model_dir and os.path.isdir(self.model_dir)): return
-        self.available_stitcher_models = [os.path.basename(f) for f in glob(os.path.join(self.model_dir, 'ai_stitcher*.ins'))]
-        for name, data in self.ENHANCEMENT_MAP.items():
-            found = glob(os.path.join(self.model_dir, data['pattern']))
-            if found: self.found_models[name] = (os.path.basename(found[0]), data['params'])
-    def log_message(self, message, tag=None):
-        def append(): self.log_text.configure(state='normal'); self.log_text.insert(tk.END, message + "\n", tag); self.log_text.configure(state='disabled'); self.log_text.see(tk.END)
-        self.master.after(0, append)
-    def update_progress(self, value):
-        def update(): self.progress_bar['value'] = value; self.progress_label['text'] = f"{value}%"
-        self.master.after(0, update)
-    def check_executables(self):
-        found_all = True
-        if not self.sdk_path: self.log_message("[!] SDK ('testSDKDemo') not found.", "error"); found_all = False
-        if not find_executable("ffprobe"): self.log_message("[!] FFprobe not found.", "error"); found_all = False
-        if not self.exiftool_path: self.log_message("[!] ExifTool not found. GPX extraction is disabled.", "error"); self.gpx_extract_button.config(state="disabled"); found_all = False
-        if found_all: self.log_message("[+] All required executables found.", "success")
-        if self.model_dir: self.log_message("[+] Model directory found.", "success")
-        else: self.log_message("[!] Model directory not found.", "error")
-    def select_convert_input_file(self, *args):
-        file_path = filedialog.askopenfilename(title="Select .insv File", filetypes=(("Insta360 Video", "*.insv"), ("All files", "*.*")))
-        if file_path: self.input_file_var.set(file_path); self.detect_and_update_options(file_path); self.check_convert_inputs()
-    def detect_and_update_options(self, file_path):
-        resolution = get_video_resolution(file_path, self.log_message)
-        all_options = {"8K": 7680, "5.7K": 5760, "4K": 3840, "3K": 3008}
-        if resolution: self.available_resolutions = [res for res, w in all_options.items() if resolution[0] >= w]
-        else: self.available_resolutions = ["5.7K", "4K", "3K"]
-        if not self.available_resolutions: self.available_resolutions = ["4K"]
-        self.res_combobox['values'] = self.available_resolutions; self.resolution_var.set(self.available_resolutions[0]); self.res_combobox.config(state="readonly")
-        if self.available_stitcher_models: self.stitcher_model_var.set(self.available_stitcher_models[0])
-        self.stitcher_combobox.config(state="readonly")
-    def select_output_folder(self, *args):
-        folder_path = filedialog.askdirectory(title="Select Output Folder")
-        if folder_path: self.output_folder_var.set(folder_path); self.check_convert_inputs()
-    def check_convert_inputs(self):
-        self.convert_button.config(state="normal" if self.input_file_var.get() and self.output_folder_var.get() else "disabled")
-    def set_convert_ui_state(self, is_running: bool):
-        state = "disabled" if is_running else "normal"; readonly_state = "disabled" if is_running else "readonly"
-        self.convert_button.config(state=state); self.cancel_button.config(state="normal" if is_running else "disabled")
-        self.res_combobox.config(state=readonly_state); self.stitcher_combobox.config(state=readonly_state)
-        for name, cb in self.enhancement_checkboxes.items():
-            if not is_running and name in self.found_models: cb.config(state="normal")
-            elif is_running: cb.config(state="disabled")
-    def start_conversion_thread(self):
-        if not self.sdk_path: self.log_message("[!] Cannot start: SDK not found.", "error"); return
-        self.set_convert_ui_state(is_running=True); self.update_progress(0)
-        self.log_text.configure(state='normal'); self.log_text.delete(1.0, tk.END); self.log_text.configure(state='disabled')
-        threading.Thread(target=self.run_conversion, daemon=True).start()
-    def cancel_conversion(self):
-        if self.current_process: self.log_message("\n[!] User requested to cancel. Terminating...", "error"); self.current_process.terminate()
-    def run_conversion(self):
-        input_file, output_folder, resolution, stitcher_model = self.input_file_var.get(), self.output_folder_var.get(), self.resolution_var.get(), self.stitcher_model_var.get()
-        enhancements = {name: self.found_models[name] for name, var in self.enhancement_vars.items() if var.get() and name in self.found_models}
-        output_file_path = os.path.join(output_folder, f"{os.path.splitext(os.path.basename(input_file))[0]}_{resolution}_360.mp4")
-        self.current_process = convert_video_with_sdk(self.sdk_path, self.model_dir, input_file, output_file_path, resolution, stitcher_model, enhancements, self.log_message)
-        if self.current_process:
-            for line in iter(self.current_process.stdout.readline, ''):
-                progress_match = re.search(r"process\s*=\s*(\d+)\s*%", line.strip())
-                if progress_match: self.update_progress(int(progress_match.group(1)))
-                elif line.strip(): self.log_message(line.strip())
-            self.current_process.wait()
-            if self.current_process.returncode == 0 and os.path.exists(output_file_path): self.log_message(f"[+] Successfully converted video.", "success"); self.update_progress(100)
-            elif "Terminating..." not in self.log_text.get("1.0", tk.END): self.log_message(f"\n[!] ERROR: SDK process failed (code {self.current_process.returncode}).", "error")
-        self.master.after(0, self.finalize_convert_ui)
-    def finalize_convert_ui(self):
-        self.set_convert_ui_state(is_running=False); self.current_process = None
-    def select_gpx_input_file(self):
-        file_path = filedialog.askopenfilename(title="Select .insv File with GPS Data", filetypes=(("Insta360 Video", "*.insv"), ("All files", "*.*")))
-        if file_path:
-            self.gpx_input_file_var.set(file_path)
-            self.gpx_output_file_var.set(os.path.splitext(file_path)[0] + ".gpx")
-            self.check_gpx_inputs()
-    def select_gpx_output_file(self):
-        file_path = filedialog.asksaveasfilename(title="Save GPX File As...", defaultextension=".gpx", filetypes=(("GPX files", "*.gpx"), ("All files", "*.*")))
-        if file_path: self.gpx_output_file_var.set(file_path); self.check_gpx_inputs()
-    def check_gpx_inputs(self):
-        self.gpx_extract_button.config(state="normal" if self.gpx_input_file_var.get() and self.gpx_output_file_var.get() else "disabled")
-    def start_gpx_extraction_thread(self):
-        if not self.exiftool_path: self.log_message("[!] Cannot start: 'exiftool' not found.", "error"); return
-        self.log_text.configure(state='normal'); self.log_text.delete(1.0, tk.END); self.log_text.configure(state='disabled')
-        self.gpx_extract_button.config(state="disabled")
-        threading.Thread(target=self.run_gpx_extraction, daemon=True).start()
+            self._render(job, partial_path, log, log_file)
+            if job.state == "done":
+                os.replace(partial_path, job.output_path)
+                ConversionManifest(os.path.dirname(job.output_path) or ".").record(job.output_path, job.fingerprint, job.settings)
+                if log: log(f"[+] Successfully converted video in {job.elapsed:.1f}s.", "success")
+        finally:
+            if os.path.exists(partial_path):
+                try: os.remove(partial_path)
+                except OSError: pass
+
+    def _render(self, job: ConversionJob, partial_path: str, log, log_file: RotatingLogFile = None):
+        job.process = convert_video_with_sdk(self.sdk_path, self.model_dir, job.input_path, partial_path, job.resolution, job.stitcher_model, job.enhancements, log, job.extra_inputs)
+        if not job.process: job.state = "failed"; return
+        if job.cancelled: job.process.terminate()
+        for line in iter(job.process.stdout.readline, ''):
+            line = line.strip()
+            progress_match = SDK_PROGRESS_RE.search(line) if "%" in line else None
+            if progress_match:
+                if log_file: log_file.write(line)
+                progress = int(progress_match.group(1))
+                if progress != job.progress: job.progress = progress; self._notify(job)
+            elif line and log: log(line)
+        job.returncode = job.process.wait()
+        if job.cancelled: job.state = "cancelled"
+        elif job.returncode == 0 and os.path.exists(partial_path):
+            job.state = "done"; job.progress = 100
+        else:
+            job.state = "failed"
+            if log: log(f"\n[!] ERROR: SDK process failed (code {job.returncode}).", "error")
+
+    def _job_logger(self, job: ConversionJob):
+        if not self.log_callback: return None
+        if self.max_workers == 1: return self.log_callback
+        def log(message, tag=None):
+            body = message.lstrip("\n"); self.log_callback(f"{message[:len(message) - len(body)]}[{job.name}] {body}", tag)
+        return log
+
+    def _notify(self, job: ConversionJob):
+        if self.job_callback: self.job_callback(job)
+
+    def _check_batch_done(self):
+        with self._cond:
+            if not self.is_idle() or self._batch_holds or self._batch_started is None: return
+            self._cond.notify_all()
+            stats = self.stats(); self._batch_started = None
+        if self.batch_callback: self.batch_callback(stats)
+
+# --- Watch-Folder Ingest ---
+
+INGEST_SETTLE_SECONDS = 5.0   # a file must keep the same size and mtime this long before it counts as fully copied
+INGEST_PAIR_SECONDS = 10.0    # how long a settled first-lens file waits for its second-lens partner
+INGEST_RESCAN_SECONDS = 30.0  # full rescan interval with inotify, in case events were lost
+INGEST_POLL_SECONDS = 2.0     # scan interval without inotify
+DUAL_LENS_RE = re.compile(r"^(?P<prefix>.+_)(?P<lens>00|10)(?P<suffix>_\d+\.insv)$", re.IGNORECASE)
+
+def lens_partner(path: str):
+    """ (lens, partner path) for dual-lens names like VID_..._00_001.insv / VID_..._10_001.insv, else (None, None). """
+    folder, name = os.path.split(path); match = DUAL_LENS_RE.match(name)
+    if not match: return None, None
+    partner_lens = "10" if match["lens"] == "00" else "00"
+    return match["lens"], os.path.join(folder, match["prefix"] + partner_lens + match["suffix"])
+
+class InotifyWatcher:
+    """ Wakes up on files finishing a write or being moved into the watched folders (Linux inotify via libc). """
+    IN_CLOSE_WRITE, IN_MOVED_TO, IN_CREATE, IN_ISDIR, IN_Q_OVERFLOW = 0x8, 0x80, 0x100, 0x40000000, 0x4000
+    EVENT = struct.Struct("iIII")
+
+    def __init__(self):
+        import ctypes, ctypes.util
+        self._libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self.fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0: raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self._folders = {}; self._watched = set()
+
+    def add(self, folder: str):
+        if folder in self._watched: return
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(folder), self.IN_CLOSE_WRITE | self.IN_MOVED_TO | self.IN_CREATE)
+        if wd >= 0: self._folders[wd] = folder; self._watched.add(folder)
+
+    def wait(self, timeout: float) -> bool:
+        """ Blocks up to `timeout` seconds; True if something in a watched folder changed. """
+        if not select.select([self.fd], [], [], timeout)[0]: return False
+        try: data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError: return False
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = self.EVENT.unpack_from(data, offset); offset += self.EVENT.size
+            name = data[offset:offset + length].rstrip(b"\0"); offset += length
+            if mask & self.IN_ISDIR and wd in self._folders: self.add(os.path.join(self._folders[wd], os.fsdecode(name)))
+        return True
+
+    def close(self):
+        os.close(self.fd)
+
+class PollingWatcher:
+    """ Fallback for systems or filesystems without inotify (e.g. network mounts): just waits for the next scan. """
+    def add(self, folder: str): pass
+    def wait(self, timeout: float) -> bool: time.sleep(timeout); return False
+    def close(self): pass
+
+class IngestQueue:
+    """ Ingest tasks in SQLite so a restart resumes where it stopped. A file version (path, size, mtime) is queued once per kind. """
+    def __init__(self, path: str):
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS tasks (id INTEGER PRIMARY KEY, kind TEXT, path TEXT, companion TEXT, size INTEGER, mtime_ns INTEGER, "
+                         "state TEXT DEFAULT 'pending', attempts INTEGER DEFAULT 0, output TEXT, error TEXT, updated_at REAL, UNIQUE (kind, path, size, mtime_ns))")
+        # Whatever was running when the previous process died starts over.
+        self._db.execute("UPDATE tasks SET state='pending' WHERE state='running'"); self._db.commit()
+
+    def known(self, kind: str, path: str, size: int, mtime_ns: int) -> bool:
+        with self._lock: return self._db.execute("SELECT 1 FROM tasks WHERE kind=? AND path=? AND size=? AND mtime_ns=?", (kind, path, size, mtime_ns)).fetchone() is not None
+
+    def add(self, kind: str, path: str, size: int, mtime_ns: int, companion: str = None, state: str = "pending") -> bool:
+        """ Queues a task; False if this version of the file already had one. """
+        with self._lock:
+            cursor = self._db.execute("INSERT OR IGNORE INTO tasks (kind, path, companion, size, mtime_ns, state, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                                      (kind, path, companion, size, mtime_ns, state, time.time()))
+            self._db.commit()
+        return cursor.rowcount > 0
+
+    def claim(self, kind: str):
+        """ Marks the oldest pending task of `kind` running and returns it as a dict, or None. """
+        with self._lock:
+            row = self._db.execute("SELECT id, kind, path, companion, attempts FROM tasks WHERE kind=? AND state='pending' ORDER BY id LIMIT 1", (kind,)).fetchone()
+            if row is None: return None
+            self._db.execute("UPDATE tasks SET state='running', attempts=attempts+1, updated_at=? WHERE id=?", (time.time(), row[0])); self._db.commit()
+        return dict(zip(("id", "kind", "path", "companion", "attempts"), row))
+
+    def finish(self, task_id: int, state: str, output: str = None, error: str = None):
+        with self._lock:
+            self._db.execute("UPDATE tasks SET state=?, output=?, error=?, updated_at=? WHERE id=?", (state, output, error, time.time(), task_id)); self._db.commit()
+
+    def release(self, task_id: int):
+        """ Puts a running task back, e.g. when the daemon stops mid-conversion. """
+        with self._lock: self._db.execute("UPDATE tasks SET state='pending' WHERE id=? AND state='running'", (task_id,)); self._db.commit()
+
+    def pending(self, kind: str) -> int:
+        with self._lock: return self._db.execute("SELECT COUNT(*) FROM tasks WHERE kind=? AND state='pending'", (kind,)).fetchone()[0]
+
+    def close(self):
+        with self._lock: self._db.close()
+
+class IngestDaemon:
+    """ Watches folders for new .insv footage and runs GPX extraction and conversion on it without manual steps.
+
+    Files are only picked up once they stopped growing; a dual-lens pair is converted together. GPX tasks
+    always go ahead of queued conversions, which are fed to the ConversionQueue one free slot at a time.
+    """
+    def __init__(self, folders, output_folder: str, queue: IngestQueue, sdk_path: str = None, model_dir: str = None, exiftool_path: str = None,
+                 resolution: str = None, stitcher_model: str = None, enhancements: dict = None, convert: bool = True, gpx: bool = True,
+                 max_workers: int = None, gpx_workers: int = 2, settle_seconds: float = INGEST_SETTLE_SECONDS, pair_seconds: float = INGEST_PAIR_SECONDS,
+                 polling: bool = False, log_callback=None, event_callback=None, catalog=None, log_dir: str = None, native_gps: bool = False):
+        self.folders = [os.path.abspath(f) for f in folders]; self.output_folder = output_folder; self.queue = queue
+        self.exiftool_path = exiftool_path; self.resolution = resolution; self.stitcher_model = stitcher_model; self.enhancements = enhancements or {}
+        self.convert = convert and bool(sdk_path); self.gpx = gpx and bool(exiftool_path); self.gpx_workers = gpx_workers; self.native_gps = native_gps
+        self.settle_seconds = settle_seconds; self.pair_seconds = pair_seconds
+        self.log_callback = log_callback; self.event_callback = event_callback; self.catalog = catalog
+        self.conversions = ConversionQueue(sdk_path, model_dir, max_workers, log_callback, job_callback=self._on_job, log_dir=log_dir)
+        self._candidates = {}   # path -> [size, mtime_ns, unchanged since]
+        self._settled = {}      # first-lens path -> settled at, while waiting for its partner
+        self._settled_partners = set()  # second-lens files that finished copying
+        self._jobs = {}; self._gpx_threads = []; self._lock = threading.Lock(); self._stop = threading.Event()
+        self.watcher = PollingWatcher()
+        if not polling:
+            try: self.watcher = InotifyWatcher()
+            except (OSError, AttributeError) as e:
+                if log_callback: log_callback(f"[-] inotify unavailable ({e}), polling every {INGEST_POLL_SECONDS:.0f}s instead.", "error")
+        self.polling = isinstance(self.watcher, PollingWatcher)
+
+    def run(self):
+        """ Blocks until stop(); running conversions are cancelled and their tasks resume on the next start. """
+        if self.log_callback: self.log_callback(f"[*] Watching {', '.join(self.folders)} ({'polling' if self.polling else 'inotify'}).")
+        next_scan = 0.0
+        try:
+            while not self._stop.is_set():
+                if time.monotonic() >= next_scan: self._scan(); next_scan = time.monotonic() + (INGEST_POLL_SECONDS if self.polling else INGEST_RESCAN_SECONDS)
+                self._settle(); self._dispatch()
+                # Tick at least once a second: settling files and finished GPX tasks need attention without any new events.
+                if self.watcher.wait(max(0.0, min(1.0, next_scan - time.monotonic()))): next_scan = 0.0
+        finally:
+            self._stop.set()
+            for job, task_id in list(self._jobs.items()): self.queue.release(task_id); self.conversions.cancel(job)
+            # The caller closes the task queue once run() returns, so GPX tasks must have recorded their result by then.
+            for thread in self._gpx_threads: thread.join()
+            self.conversions.wait(); self.watcher.close()
+
+    def stop(self):
+        self._stop.set()
+
+    def _scan(self):
+        for folder in self.folders:
+            for root, dirs, files in os.walk(folder):
+                dirs[:] = [d for d in dirs if not d.startswith(".")]
+                self.watcher.add(root)
+                for name in files:
+                    if not name.lower().endswith(".insv") or name.startswith("."): continue
+                    path = os.path.join(root, name)
+                    if path in self._candidates or path in self._settled or path in self._settled_partners: continue
+                    try: st = os.stat(path)
+                    except OSError: continue
+                    if not self._queued(path, st): self._candidates[path] = [st.st_size, st.st_mtime_ns, time.monotonic()]
+
+    def _queued(self, path: str, st) -> bool:
+        kinds = (["gpx"] if self.gpx else []) + (["convert"] if self.convert else [])
+        lens, _ = lens_partner(path)
+        if lens == "10": kinds = ["convert"] if self.convert else []  # second-lens files carry no GPS and are converted with their partner
+        return all(self.queue.known(kind, path, st.st_size, st.st_mtime_ns) for kind in kinds) or (lens == "10" and self._partner_known(path))
+
+    def _partner_known(self, path: str) -> bool:
+        _, partner = lens_partner(path)
+        try: st = os.stat(partner)
+        except OSError: return False
+        return self.queue.known("convert", partner, st.st_size, st.st_mtime_ns)
+
+    def _settle(self):
+        now = time.monotonic()
+        for path, state in list(self._candidates.items()):
+            try: st = os.stat(path)
+            except OSError: del self._candidates[path]; continue
+            if (st.st_size, st.st_mtime_ns) != (state[0], state[1]): self._candidates[path] = [st.st_size, st.st_mtime_ns, now]; continue
+            if now - state[2] < self.settle_seconds: continue
+            del self._candidates[path]
+            lens, _ = lens_partner(path)
+            if lens == "10": self._settled_partners.add(path); continue  # converted together with its first-lens partner
+            if self.gpx and self.queue.add("gpx", path, st.st_size, st.st_mtime_ns): self._log(f"[+] New clip: {os.path.basename(path)}")
+            if self.convert: self._settled[path] = now
+        for path, settled_at in list(self._settled.items()):
+            lens, partner = lens_partner(path); partner_st = None
+            if lens == "00":
+                try: partner_st = os.stat(partner)
+                except OSError:
+                    if now - settled_at < self.pair_seconds: continue  # the second lens may not have been copied yet
+                if partner_st and partner not in self._settled_partners:
+                    self._candidates.setdefault(partner, [partner_st.st_size, partner_st.st_mtime_ns, now]); continue  # second lens still copying
+            del self._settled[path]; self._settled_partners.discard(partner)
+            try: st = os.stat(path)
+            except OSError: continue
+            if not self.queue.add("convert", path, st.st_size, st.st_mtime_ns, partner if partner_st else None): continue
+            # The partner is recorded as handled so it is not picked up again on its own.
+            if partner_st: self.queue.add("convert", partner, partner_st.st_size, partner_st.st_mtime_ns, path, state="paired")
+
+    def _dispatch(self):
+        self._gpx_threads = [thread for thread in self._gpx_threads if thread.is_alive()]
+        while self.gpx and len(self._gpx_threads) < self.gpx_workers:
+            task = self.queue.claim("gpx")
+            if task is None: break
+            thread = threading.Thread(target=self._run_gpx, args=(task,), daemon=True); self._gpx_threads.append(thread); thread.start()
+        if not self.convert or self.queue.pending("gpx"): return  # maps first: conversions wait until every queued GPX has started
+        while len(self._jobs) < self.conversions.max_workers:
+            task = self.queue.claim("convert")
+            if task is None: break
+            resolution = self.resolution or available_resolutions(get_video_resolution(task["path"], self.log_callback, catalog=self.catalog))[0]
+            job = self.conversions.submit(task["path"], self.output_folder, resolution, self.stitcher_model, self.enhancements, extra_inputs=[task["companion"]] if task["companion"] else (), tag=task["id"])
+            # A job that is skipped or fails right away may already have been handled by _on_job.
+            with self._lock:
+                if not job.finished: self._jobs[job] = task["id"]
+
+    def _run_gpx(self, task: dict):
+        output_path = os.path.join(self.output_folder, os.path.splitext(os.path.basename(task["path"]))[0] + ".gpx")
+        try: ok = extract_gpx_using_proven_method(self.exiftool_path, task["path"], output_path, self.log_callback, catalog=self.catalog, native=self.native_gps)
+        except Exception as e: ok = False; self._log(f"[!] ERROR: GPX extraction crashed for {os.path.basename(task['path'])}: {e}", "error")
+        # Ctrl+C also reaches the ExifTool processes; a failure while stopping is retried on the next start.
+        if not ok and self._stop.is_set(): self.queue.release(task["id"]); return
+        self.queue.finish(task["id"], "done" if ok else "failed", output_path if ok else None)
+        self._event(task, "done" if ok else "failed", output_path if ok else None)
+
+    def _on_job(self, job: ConversionJob):
+        if not job.finished: return
+        with self._lock: self._jobs.pop(job, None)
+        if job.tag is None or self._stop.is_set(): return  # stopping: the task was released for the next start
+        task_id = job.tag
+        state = "done" if job.state in ("done", "skipped") else job.state
+        self.queue.finish(task_id, state, job.output_path if state == "done" else None, None if state == "done" else f"SDK exit code {job.returncode}")
+        self._event({"id": task_id, "kind": "convert", "path": job.input_path, "companion": job.extra_inputs[0] if job.extra_inputs else None}, state, job.output_path if state == "done" else None)
+
+    def _event(self, task: dict, state: str, output: str = None):
+        if self.event_callback: self.event_callback({"kind": task["kind"], "input": task["path"], "companion": task.get("companion"), "state": state, "output": output})
+
+    def _log(self, message: str, tag=None):
+        if self.log_callback: self.log_callback(message, tag)
+
+# --- Command Line Interface ---
+
+EXIT_OK, EXIT_FAILED, EXIT_USAGE, EXIT_MISSING_TOOL, EXIT_INTERRUPTED = 0, 1, 2, 3, 130
+
+def cli_logger(quiet: bool = False):
+    """ log_callback for headless runs: messages go to stderr so stdout carries only the JSON result. """
+    def log(message, tag=None):
+        if quiet and tag != "error": return
+        print(message, file=sys.stderr, flush=True)
+    return log
+
+def emit_json(payload):
+    json.dump(payload, sys.stdout, indent=2); sys.stdout.write("\n"); sys.stdout.flush()
+
+def expand_inputs(paths) -> list:
+    """ Input files as given, with directories expanded to the .insv files directly inside them. """
+    files = []
+    for path in paths:
+        if os.path.isdir(path): files.extend(sorted(glob(os.path.join(path, "*.insv"))))
+        else: files.append(path)
+    return files
+
+def open_cli_catalog(no_cache: bool, ffprobe_path: str = None, exiftool_path: str = None, log_callback=None, native_gps: bool = False) -> MediaCatalog:
+    if not no_cache:
+        try: return MediaCatalog(os.path.join(default_cache_dir(), "media.sqlite"), ffprobe_path, exiftool_path, native_gps)
+        except (OSError, sqlite3.Error) as e:
+            if log_callback: log_callback(f"[-] Warning: media catalog unavailable ({e}), probing without it.", "error")
+    return MediaCatalog(":memory:", ffprobe_path, exiftool_path, native_gps)
+
+def cli_probe(args, log) -> int:
+    ffprobe_path = find_executable("ffprobe"); exiftool_path = find_executable("exiftool")
+    if not ffprobe_path: log("[!] FFprobe not found.", "error"); return EXIT_MISSING_TOOL
+    if args.gps and not exiftool_path: log("[!] ExifTool not found.", "error"); return EXIT_MISSING_TOOL
+    catalog = open_cli_catalog(args.no_cache, ffprobe_path, exiftool_path, log, native_gps=args.native_gps)
+    files = expand_inputs(args.inputs); results = []
+    for file_path, record in zip(files, catalog.probe_many(files, args.workers, args.gps, log)):
+        if record: results.append(dict(record, available_resolutions=available_resolutions((record["width"], record["height"]) if record["width"] else None)))
+        else: results.append({"path": os.path.abspath(file_path), "error": "probe failed"})
+    catalog.close(); emit_json(results)
+    return EXIT_OK if all("error" not in r for r in results) else EXIT_FAILED
+
+def cli_gpx(args, log) -> int:
+    exiftool_path = find_executable("exiftool")
+    if not exiftool_path: log("[!] ExifTool not found.", "error"); return EXIT_MISSING_TOOL
+    files = expand_inputs(args.inputs)
+    if args.merge:
+        output_path = args.output or (os.path.splitext(files[0])[0] + "_merged.gpx" if files else None)
+        if not output_path or not output_path.lower().endswith(".gpx"): log("[!] --merge needs clips and an output .gpx file.", "error"); return EXIT_USAGE
+        catalog = open_cli_catalog(args.no_cache, exiftool_path=exiftool_path, log_callback=log)
+        ok = extract_merged_gpx(exiftool_path, files, output_path, max(1, min(args.workers, len(files))), args.gap, log, catalog, native=args.native_gps)
+        catalog.close(); emit_json({"inputs": files, "output": output_path, "ok": ok})
+        return EXIT_OK if ok else EXIT_FAILED
+    if args.output and args.output.lower().endswith(".gpx"):
+        if len(files) != 1: log("[!] An output .gpx file needs exactly one input; pass a folder for several.", "error"); return EXIT_USAGE
+        items = [(files[0], args.output)]
+    else:
+        if args.output: os.makedirs(args.output, exist_ok=True)
+        items = [(f, os.path.join(args.output or os.path.dirname(os.path.abspath(f)), os.path.splitext(os.path.basename(f))[0] + ".gpx")) for f in files]
+    catalog = open_cli_catalog(args.no_cache, exiftool_path=exiftool_path, log_callback=log)
+    results = extract_gpx_batch(exiftool_path, items, max(1, min(args.workers, len(items))), log, catalog, native=args.native_gps)
+    catalog.close()
+    report = [{"input": video_path, "output": output_path, "ok": results.get(video_path, False)} for video_path, output_path in items]
+    emit_json(report)
+    return EXIT_OK if all(r["ok"] for r in report) else EXIT_FAILED
+
+def enhancement_slug(name: str) -> str:
+    return name.lower().replace(" ", "-")
+
+def cli_sdk_setup(args, log):
+    """ (sdk_path, model_dir, stitcher_model, enhancements) from the convert options, or None after logging what is missing. """
+    sdk_path = find_executable("testSDKDemo")
+    if not sdk_path: log("[!] SDK ('testSDKDemo') not found.", "error"); return None
+    model_dir = args.model_dir or default_model_dir(sdk_path)
+    stitchers, found_models = discover_models(model_dir)
+    stitcher_model = args.stitcher or (stitchers[0] if stitchers else None)
+    if not stitcher_model: log(f"[!] No stitcher model found in {model_dir}.", "error"); return None
+    enhancements = {}
+    for slug in args.enhance or []:
+        name = next(n for n in ENHANCEMENT_MAP if enhancement_slug(n) == slug)
+        if name not in found_models: log(f"[!] Model for '{name}' not found in {model_dir}.", "error"); return None
+        enhancements[name] = found_models[name]
+    return sdk_path, model_dir, stitcher_model, enhancements
+
+def cli_convert(args, log) -> int:
+    setup = cli_sdk_setup(args, log)
+    if setup is None: return EXIT_MISSING_TOOL
+    sdk_path, model_dir, stitcher_model, enhancements = setup
+    files = expand_inputs(args.inputs); os.makedirs(args.output, exist_ok=True)
+    catalog = None if args.resolution else open_cli_catalog(args.no_cache, find_executable("ffprobe"), log_callback=log)
+    queue = ConversionQueue(sdk_path, model_dir, args.jobs, log, log_dir=args.log_dir); jobs = []
+    with queue.batch():
+        for file_path in files:
+            # Without --resolution, each clip gets the largest output its source supports, as the GUI preselects.
+            resolution = args.resolution or available_resolutions(get_video_resolution(file_path, log, catalog=catalog))[0]
+            jobs.append(queue.submit(file_path, args.output, resolution, stitcher_model, enhancements, force=args.force))
+    if catalog: catalog.close()
+    interrupted = False
+    try:
+        while not queue.wait(0.5): pass
+    except KeyboardInterrupt:
+        interrupted = True; queue.cancel_all(); queue.wait()
+    stats = queue.stats()
+    emit_json({"jobs": [{"input": j.input_path, "output": j.output_path, "resolution": j.resolution, "stitcher_model": j.stitcher_model, "enhancements": list(j.enhancements),
+                         "state": j.state, "returncode": j.returncode, "elapsed": round(j.elapsed, 3), "log": j.log_path} for j in jobs],
+               "stats": stats})
+    if interrupted: return EXIT_INTERRUPTED
+    return EXIT_OK if stats["done"] + stats["skipped"] == stats["total"] else EXIT_FAILED
+
+def cli_watch(args, log) -> int:
+    not_folders = [path for path in args.inputs if not os.path.isdir(path)]
+    if not_folders: log(f"[!] Not a folder: {', '.join(not_folders)}", "error"); return EXIT_USAGE
+    sdk_path = model_dir = stitcher_model = None; enhancements = {}
+    if not args.no_convert:
+        setup = cli_sdk_setup(args, log)
+        if setup is None: return EXIT_MISSING_TOOL
+        sdk_path, model_dir, stitcher_model, enhancements = setup
+    exiftool_path = None if args.no_gpx else find_executable("exiftool")
+    if not args.no_gpx and not exiftool_path: log("[!] ExifTool not found.", "error"); return EXIT_MISSING_TOOL
+    os.makedirs(args.output, exist_ok=True)
+    queue = IngestQueue(args.state or os.path.join(args.output, ".vision360-ingest.sqlite"))
+    catalog = open_cli_catalog(args.no_cache, find_executable("ffprobe"), exiftool_path, log)
+    def report(event): print(json.dumps(event), flush=True)
+    daemon = IngestDaemon(args.inputs, args.output, queue, sdk_path, model_dir, exiftool_path, args.resolution, stitcher_model, enhancements,
+                          max_workers=args.jobs, settle_seconds=args.settle, polling=args.poll, log_callback=log, event_callback=report, catalog=catalog, log_dir=args.log_dir,
+                          native_gps=args.native_gps)
+    for signum in (signal.SIGINT, signal.SIGTERM): signal.signal(signum, lambda *_: daemon.stop())
+    try: daemon.run()
+    finally: queue.close(); catalog.close()
+    log("[*] Stopped; unfinished tasks resume on the next start.")
+    return EXIT_OK
+
+def build_cli_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="vision360", description="Insta360 .insv conversion and GPS extraction. Without a command, the GUI starts.",
+                                     epilog=f"Exit codes: {EXIT_OK} success, {EXIT_FAILED} some inputs failed, {EXIT_USAGE} usage error, {EXIT_MISSING_TOOL} missing tool or model, {EXIT_INTERRUPTED} interrupted.")
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("inputs", nargs="+", help=".insv files, or folders of them")
+    common.add_argument("-q", "--quiet", action="store_true", help="only log errors to stderr")
+    common.add_argument("--no-cache", action="store_true", help="do not read or update the media catalog")
+    sdk_options = argparse.ArgumentParser(add_help=False)
+    sdk_options.add_argument("-o", "--output", required=True, help="output folder")
+    sdk_options.add_argument("-r", "--resolution", choices=list(RESOLUTION_WIDTHS), help="default: the largest the source supports")
+    sdk_options.add_argument("--stitcher", help="stitcher model file name (default: the first one found)")
+    sdk_options.add_argument("--enhance", action="append", choices=[enhancement_slug(n) for n in ENHANCEMENT_MAP], help="enable an enhancement model; repeatable")
+    sdk_options.add_argument("--model-dir", help="SDK model folder (default: modelfile/ next to the SDK)")
+    sdk_options.add_argument("--log-dir", help="also write each clip's full SDK output to a rotating log file in this folder")
+    sdk_options.add_argument("-j", "--jobs", type=int, default=default_conversion_workers(), help="parallel SDK processes (default: %(default)s)")
+    commands = parser.add_subparsers(dest="command", metavar="{convert,gpx,probe,watch,gui}")
+    convert = commands.add_parser("convert", parents=[common, sdk_options], help="convert clips to 360° MP4 with the Insta360 SDK")
+    convert.add_argument("--force", action="store_true", help="re-render even when the output folder's manifest shows an up-to-date result")
+    gpx = commands.add_parser("gpx", parents=[common], help="extract GPS tracks to GPX")
+    gpx.add_argument("-o", "--output", help="output .gpx file (single input) or folder (default: next to each input)")
+    gpx.add_argument("--merge", action="store_true", help="merge all clips into one time-ordered track (default output: <first clip>_merged.gpx)")
+    gpx.add_argument("--gap", type=float, default=GPX_GAP_SECONDS, help="with --merge, start a new track segment after a pause this long in seconds (default: %(default)s)")
+    gpx.add_argument("-w", "--workers", type=int, default=4, help="parallel ExifTool sessions (default: %(default)s)")
+    gpx.add_argument("--native-gps", action="store_true", help="read the GPS trailer of .insv files directly, falling back to ExifTool for files it does not recognize")
+    probe = commands.add_parser("probe", parents=[common], help="print resolution, codec, duration and optionally GPS span as JSON")
+    probe.add_argument("--gps", action="store_true", help="also read the GPS time span (runs ExifTool)")
+    probe.add_argument("-w", "--workers", type=int, default=4, help="parallel probes (default: %(default)s)")
+    probe.add_argument("--native-gps", action="store_true", help="with --gps, read the GPS trailer of .insv files directly, falling back to ExifTool for files it does not recognize")
+    watch = commands.add_parser("watch", parents=[common, sdk_options], help="ingest new footage from folders: GPX first, then conversion; prints one JSON line per finished task")
+    watch.add_argument("--no-convert", action="store_true", help="only extract GPX")
+    watch.add_argument("--no-gpx", action="store_true", help="only convert")
+    watch.add_argument("--settle", type=float, default=INGEST_SETTLE_SECONDS, help="seconds a file must stop growing before it is processed (default: %(default)s)")
+    watch.add_argument("--poll", action="store_true", help="scan periodically instead of using inotify (e.g. for network mounts)")
+    watch.add_argument("--native-gps", action="store_true", help="read the GPS trailer of .insv files directly, falling back to ExifTool for files it does not recognize")
+    watch.add_argument("--state", help="persistent queue database (default: .vision360-ingest.sqlite in the output folder)")
+    commands.add_parser("gui", help="start the desktop application (the default)")
+    return parser
+
+def main(argv=None) -> int:
+    parser = build_cli_parser(); args = parser.parse_args(argv)
+    if args.command in (None, "gui"):
+        from vision360_gui import run_gui  # Tk, the map widget and NumPy load only here
+        run_gui(); return EXIT_OK
+    missing = [path for path in args.inputs if not os.path.exists(path)]
+    if missing: parser.error(f"no such file or folder: {', '.join(missing)}")
+    handlers = {"convert": cli_convert, "gpx": cli_gpx, "probe": cli_probe, "watch": cli_watch}
+    return handlers[args.command](args, cli_logger(args.quiet))
 
 if __name__ == "__main__":
-    root = tk.Tk()
-    app = InstaToolApp(root)
-    root.mainloop()
\ No newline at end of file
+    # Let vision360_gui's `import vision360` reuse this module instead of loading the file a second time.
+    sys.modules.setdefault("vision360", sys.modules[__name__])
+    sys.exit(main())
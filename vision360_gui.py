@@ -0,0 +1,792 @@
+""" Tkinter front end for Vision360 Toolbox: conversion queue, GPX extraction and the map viewer.
+
+Imported on demand by `vision360.main()`, so the headless CLI never loads Tk, the map widget or NumPy.
+"""
+import tkinter as tk
+from tkinter import ttk, filedialog, scrolledtext, messagebox
+import os
+import threading
+import time
+import io
+import struct
+import datetime
+import sqlite3
+import urllib.request
+import urllib.error
+from array import array
+from collections import deque
+from xml.etree import ElementTree
+import webbrowser
+import numpy as np
+from tkintermapview import TkinterMapView
+from tkintermapview.canvas_path import CanvasPath
+from PIL import Image, ImageTk, UnidentifiedImageError
+
+from vision360 import (ENHANCEMENT_MAP, ConversionQueue, LogBuffer, MediaCatalog, available_resolutions, default_cache_dir, default_conversion_workers,
+                       default_model_dir, discover_models, extract_gpx_using_proven_method, extract_merged_gpx, find_executable, get_video_resolution, resource_path)
+
+# --- Track Level of Detail ---
+
+LOD_ZOOM_LEVELS = (2, 4, 6, 8, 10, 12, 14, 16)  # zooms beyond 16 reuse the finest level
+MAP_VERTEX_BUDGET = 5000
+
+def mercator_project(lat, lon):
+    """ Projects degrees to Web Mercator world coordinates in [0, 1], as the tile grid uses them. """
+    lat = np.clip(np.asarray(lat, dtype=np.float64), -85.05112878, 85.05112878)
+    x = (np.asarray(lon, dtype=np.float64) + 180.0) / 360.0
+    y = (1.0 - np.log(np.tan(np.radians(lat)) + 1.0 / np.cos(np.radians(lat))) / np.pi) / 2.0
+    return x, y
+
+def simplify_track(x, y, tolerance: float):
+    """ Douglas-Peucker simplification; returns the indices of the vertices to keep.
+
+    Works breadth-first: every round splits all still-open segments at once with whole-array
+    operations, so the Python loop runs once per recursion depth rather than once per vertex.
+    """
+    n = len(x)
+    if n < 3: return np.arange(n)
+    # Drop runs of points that stay within one tolerance-sized grid cell first; GPS tracks are dense.
+    cell_x, cell_y = np.floor(x / tolerance), np.floor(y / tolerance)
+    candidates = np.flatnonzero(np.r_[True, (cell_x[1:] != cell_x[:-1]) | (cell_y[1:] != cell_y[:-1])])
+    if candidates[-1] != n - 1: candidates = np.r_[candidates, n - 1]
+    cx, cy = x[candidates], y[candidates]
+    keep = np.zeros(len(candidates), dtype=bool); keep[0] = keep[-1] = True
+    tolerance_sq = tolerance * tolerance; active = np.arange(1, len(candidates) - 1)
+    while active.size:
+        kept = np.flatnonzero(keep); segment = np.searchsorted(kept, active) - 1
+        start, end = kept[segment], kept[segment + 1]
+        dx, dy = cx[end] - cx[start], cy[end] - cy[start]
+        sx, sy = cx[active] - cx[start], cy[active] - cy[start]
+        length_sq = dx * dx + dy * dy; cross_sq = (sx * dy - sy * dx) ** 2
+        dist_sq = np.where(length_sq > 0, cross_sq / np.where(length_sq > 0, length_sq, 1.0), sx * sx + sy * sy)
+        # `active` is sorted, so each segment's points are contiguous.
+        firsts = np.flatnonzero(np.r_[True, segment[1:] != segment[:-1]]); counts = np.diff(np.r_[firsts, active.size])
+        segment_max = np.maximum.reduceat(dist_sq, firsts); split = segment_max > tolerance_sq
+        if not split.any(): break
+        still_open = np.repeat(split, counts)
+        farthest = np.flatnonzero(still_open & (dist_sq == np.repeat(segment_max, counts)))
+        farthest = farthest[np.r_[True, segment[farthest[1:]] != segment[farthest[:-1]]]]  # first maximum per segment
+        keep[active[farthest]] = True; still_open[farthest] = False
+        active = active[still_open]
+    return candidates[keep]
+
+class TrackLOD:
+    """ A pyramid of simplified versions of one track, picked by zoom so the map draws a bounded number of vertices. """
+    def __init__(self, lat, lon, zoom_levels=LOD_ZOOM_LEVELS, vertex_budget: int = MAP_VERTEX_BUDGET):
+        self.lat = np.asarray(lat, dtype=np.float64); self.lon = np.asarray(lon, dtype=np.float64)
+        self.x, self.y = mercator_project(self.lat, self.lon); self.vertex_budget = vertex_budget
+        self.levels = {}; indices = np.arange(len(self.lat))
+        # Each coarser level simplifies the previous one, so only the finest pass touches every point.
+        for zoom in sorted(zoom_levels, reverse=True):
+            tolerance = 0.5 / (256 * 2 ** zoom)  # half a screen pixel at this zoom
+            indices = indices[simplify_track(self.x[indices], self.y[indices], tolerance)]
+            self.levels[zoom] = indices
+
+    def __len__(self): return len(self.lat)
+
+    def level_for_zoom(self, zoom: float):
+        usable = [z for z in self.levels if z <= zoom]
+        return self.levels[max(usable) if usable else min(self.levels)]
+
+    def visible_runs(self, zoom: float, window=None):
+        """ Returns ([(lat, lon) runs], clipped) to draw at `zoom`; `window` is (x0, y0, x1, y1) in world coordinates.
+
+        When a level is over the vertex budget only the parts inside the window are kept, split into runs
+        so no false segments are drawn across the gaps; if that is still too much, a coarser level is used.
+        """
+        coarser = sorted((z for z in self.levels if z <= zoom), reverse=True) or [min(self.levels)]
+        for level_zoom in coarser:
+            indices = self.levels[level_zoom]
+            if len(indices) <= self.vertex_budget: return [self._positions(indices)], False
+            if window is None: continue
+            x, y = self.x[indices], self.y[indices]
+            inside = (x >= window[0]) & (x <= window[2]) & (y >= window[1]) & (y <= window[3])
+            # Keep the neighbours where the track leaves the window so its segments still reach the edge.
+            shown = inside.copy(); shown[:-1] |= inside[1:]; shown[1:] |= inside[:-1]
+            if np.count_nonzero(shown) > self.vertex_budget: continue
+            edges = np.flatnonzero(np.diff(np.r_[0, shown.astype(np.int8), 0]))
+            return [self._positions(indices[a:b]) for a, b in zip(edges[::2], edges[1::2]) if b - a > 1], True
+        return [self._positions(self.levels[min(self.levels)])], False
+
+    def _positions(self, indices):
+        return list(zip(self.lat[indices].tolist(), self.lon[indices].tolist()))
+
+class TrackMapView(TkinterMapView):
+    """ TkinterMapView that redraws a loaded track from its level-of-detail pyramid as the zoom changes,
+    and loads tiles through an optional on-disk TileCache. """
+    def __init__(self, *args, tile_cache=None, **kwargs):
+        self.track_lod = None; self.track_paths = []; self.track_style = {}; self._track_view = None
+        self.tile_cache = tile_cache
+        super().__init__(*args, **kwargs)
+
+    def request_image(self, zoom: int, x: int, y: int, db_cursor=None):
+        if self.tile_cache is None or self.overlay_tile_server is not None: return super().request_image(zoom, x, y, db_cursor)
+        try: data = self.tile_cache.fetch(self.tile_server, zoom, x, y)
+        except OSError: return self.empty_tile_image  # offline and not cached: try again next time
+        try:
+            if data is None: raise UnidentifiedImageError("tile not available")
+            image_tk = ImageTk.PhotoImage(Image.open(io.BytesIO(data))) if self.running else self.empty_tile_image
+        except UnidentifiedImageError: image_tk = self.empty_tile_image
+        except Exception: return self.empty_tile_image
+        self.tile_image_cache[f"{zoom}{x}{y}"] = image_tk
+        return image_tk
+
+    def set_track(self, track_lod: TrackLOD, **path_kwargs):
+        self.clear_track(); self.track_lod = track_lod; self.track_style = path_kwargs
+        self.refresh_track()
+
+    def clear_track(self):
+        for path in self.track_paths: path.delete()
+        self.track_paths = []; self.track_lod = None; self._track_view = None
+
+    def delete_all_path(self):
+        self.clear_track(); super().delete_all_path()
+
+    def refresh_track(self, force: bool = False):
+        if self.track_lod is None: return
+        zoom = round(self.zoom); scale = 2.0 ** zoom
+        x0, y0 = self.upper_left_tile_pos[0] / scale, self.upper_left_tile_pos[1] / scale
+        x1, y1 = self.lower_right_tile_pos[0] / scale, self.lower_right_tile_pos[1] / scale
+        if not force and self._track_view and self._track_view[0] == zoom:
+            # Still inside the area drawn last time, so panning alone needs no new geometry.
+            wx0, wy0, wx1, wy1 = self._track_view[1]
+            if wx0 <= x0 and wy0 <= y0 and x1 <= wx1 and y1 <= wy1: return
+        # Clip generously so a screen's worth of panning in any direction stays covered.
+        w, h = x1 - x0, y1 - y0; window = (x0 - w, y0 - h, x1 + w, y1 + h)
+        runs, clipped = self.track_lod.visible_runs(zoom, window)
+        for path in self.track_paths: path.delete()
+        self.track_paths = []
+        for run in runs:
+            path = CanvasPath(self, run, **self.track_style); self.canvas_path_list.append(path); self.track_paths.append(path); path.draw()
+        self._track_view = (zoom, window if clipped else (-np.inf, -np.inf, np.inf, np.inf))
+        self.manage_z_order()
+
+    def draw_zoom(self):
+        super().draw_zoom(); self.refresh_track()
+
+    def mouse_release(self, event):
+        super().mouse_release(event); self.refresh_track()
+
+# --- Track Loading ---
+
+TRACK_SIDECAR_SUFFIX = ".v360track"
+TRACK_SIDECAR_MAGIC, TRACK_SIDECAR_FORMAT = b"V360TRK", 1
+# magic, format, source size, source mtime_ns, points, segments, min_lat, min_lon, max_lat, max_lon
+TRACK_SIDECAR_HEADER = struct.Struct("<7sBqqqq4d")
+TRACK_MOVING_SPEED = 0.5  # m/s; slower steps count as standing still
+EARTH_RADIUS_M = 6371008.8
+
+class GPXTrack:
+    """ One GPX file's track points as columns: lat, lon, ele (NaN if missing), epoch seconds (NaN if missing),
+    the index where each track segment starts, and the ((min_lat, min_lon), (max_lat, max_lon)) box or None. """
+    def __init__(self, lat, lon, ele, time, segment_starts, bounds=None):
+        self.lat, self.lon, self.ele, self.time, self.segment_starts = lat, lon, ele, time, segment_starts
+        self.bounds = bounds
+
+    def __len__(self): return len(self.lat)
+
+    def map_bounds(self):
+        """ The bounding box as TkinterMapView.fit_bounding_box() takes it: (top left, bottom right), or None. """
+        if self.bounds is None: return None
+        (min_lat, min_lon), (max_lat, max_lon) = self.bounds
+        return (max_lat, min_lon), (min_lat, max_lon)
+
+    def stats(self) -> dict:
+        """ Distance, durations, speeds and elevation gain/loss; nothing is counted across a segment break. """
+        n = len(self); segment = np.zeros(n, dtype=np.int64)
+        segment[self.segment_starts[(self.segment_starts > 0) & (self.segment_starts < n)]] = 1; segment = np.cumsum(segment)
+        same_segment = segment[1:] == segment[:-1]
+        lat, lon = np.radians(self.lat), np.radians(self.lon)
+        # Haversine between consecutive points.
+        a = np.sin(np.diff(lat) / 2) ** 2 + np.cos(lat[:-1]) * np.cos(lat[1:]) * np.sin(np.diff(lon) / 2) ** 2
+        distance = np.r_[0.0, np.cumsum(np.where(same_segment, 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.minimum(a, 1.0))), 0.0))]
+        # Speeds between points whose timestamps differ: GPS often logs several points per whole second.
+        stamped = np.flatnonzero(~np.isnan(self.time)); timed = stamped[np.r_[True, np.diff(self.time[stamped]) != 0]] if stamped.size else stamped
+        dt = np.diff(self.time[timed]); step = np.diff(distance[timed])
+        usable = (segment[timed][1:] == segment[timed][:-1]) & (dt > 0)
+        speed = np.divide(step, dt, out=np.zeros_like(step), where=usable); moving = usable & (speed >= TRACK_MOVING_SPEED)
+        moving_time, moving_distance = float(dt[moving].sum()), float(step[moving].sum())
+        # Light smoothing, as GPS elevation jitters by a few metres from point to point.
+        ele = self.ele.copy()
+        if n > 2: ele[1:-1] = 0.3 * self.ele[:-2] + 0.4 * self.ele[1:-1] + 0.3 * self.ele[2:]
+        climb = np.where(same_segment, np.diff(ele), np.nan)
+        # Duration adds up each segment's first-to-last time span, as gpxpy's get_duration() does.
+        boundary = segment[stamped][1:] != segment[stamped][:-1]
+        duration = float(np.sum(self.time[stamped[np.r_[boundary, True]]] - self.time[stamped[np.r_[True, boundary]]])) if stamped.size else 0.0
+        return {"points": n, "segments": int(len(self.segment_starts)), "distance_m": float(distance[-1]) if n else 0.0,
+                "duration_s": duration, "moving_time_s": moving_time,
+                "avg_speed_mps": moving_distance / moving_time if moving_time else 0.0, "max_speed_mps": float(speed.max()) if speed.size else 0.0,
+                "elevation_gain_m": float(np.nansum(np.clip(climb, 0, None))), "elevation_loss_m": float(np.abs(np.nansum(np.clip(climb, None, 0))))}
+
+def _local_tag(tag: str) -> str:
+    return tag.rpartition("}")[2]
+
+def _epoch_seconds(times: list):
+    """ ISO 8601 timestamps (None where missing) as float epoch seconds, NaN where missing or unreadable. """
+    if not times: return np.zeros(0)
+    # The usual UTC "...Z" form converts in one go; offsets and odd spellings take the slow path below.
+    if all(t is None or t[-1:] == "Z" for t in times):
+        try:
+            stamps = np.array([t[:-1] if t else "NaT" for t in times], dtype="datetime64[ms]")
+            epoch = stamps.astype(np.int64) / 1e3; epoch[np.isnat(stamps)] = np.nan
+            return epoch
+        except ValueError: pass
+    def parse(t):
+        try: moment = datetime.datetime.fromisoformat(t.replace("Z", "+00:00"))
+        except (AttributeError, ValueError): return np.nan
+        return (moment if moment.tzinfo else moment.replace(tzinfo=datetime.timezone.utc)).timestamp()
+    return np.array([parse(t) for t in times], dtype=np.float64)
+
+TRACK_TIME_BATCH = 4096  # timestamp strings held before they are converted to epoch seconds
+
+def parse_gpx_track(gpx_path: str) -> GPXTrack:
+    """ Streams the track points of a GPX file into arrays without building a document tree; memory stays at a few bytes per point. """
+    lat, lon, ele, epoch, times, segment_starts = array("d"), array("d"), array("d"), array("d"), [], array("q")
+    point_ele = point_time = None; segment = None; nan = float("nan")
+    for event, elem in ElementTree.iterparse(gpx_path, events=("start", "end")):
+        tag = _local_tag(elem.tag)
+        if event == "start":
+            if tag == "trkseg": segment = elem; segment_starts.append(len(lat))
+            continue
+        if tag == "ele": point_ele = elem.text
+        elif tag == "time": point_time = elem.text
+        elif tag == "trkpt":
+            lat.append(float(elem.get("lat"))); lon.append(float(elem.get("lon")))
+            try: ele.append(float(point_ele))
+            except (TypeError, ValueError): ele.append(nan)
+            times.append(point_time.strip() if point_time else None)
+            # Timestamps only stay strings for one batch; the columns keep them as float64 seconds.
+            if len(times) == TRACK_TIME_BATCH: epoch.extend(_epoch_seconds(times)); times.clear()
+            point_ele = point_time = None
+            # Finished points are dropped from the partial tree as soon as they are read.
+            if segment is not None: segment.clear()
+        elif tag == "trkseg": segment = None
+        elif tag in ("wpt", "rtept", "metadata"): point_ele = point_time = None; elem.clear()
+    lat, lon = np.frombuffer(lat, dtype=np.float64), np.frombuffer(lon, dtype=np.float64); epoch.extend(_epoch_seconds(times))
+    starts = np.unique(np.frombuffer(segment_starts, dtype=np.int64)); starts = starts[starts < len(lat)]
+    bounds = ((float(lat.min()), float(lon.min())), (float(lat.max()), float(lon.max()))) if len(lat) else None
+    return GPXTrack(lat, lon, np.frombuffer(ele, dtype=np.float64), np.frombuffer(epoch, dtype=np.float64), starts if len(starts) else np.zeros(min(len(lat), 1), dtype=np.int64), bounds)
+
+def track_sidecar_path(gpx_path: str) -> str:
+    folder, name = os.path.split(gpx_path)
+    return os.path.join(folder, f".{name}{TRACK_SIDECAR_SUFFIX}")
+
+def write_track_sidecar(track: GPXTrack, sidecar_path: str, source_stat):
+    """ Header, then the lat/lon/ele/time columns as float64 and the segment starts as int64, all little-endian. """
+    (min_lat, min_lon), (max_lat, max_lon) = track.bounds or ((np.nan, np.nan), (np.nan, np.nan))
+    temp_path = f"{sidecar_path}.{os.getpid()}.tmp"
+    try:
+        with open(temp_path, "wb") as f:
+            f.write(TRACK_SIDECAR_HEADER.pack(TRACK_SIDECAR_MAGIC, TRACK_SIDECAR_FORMAT, source_stat.st_size, source_stat.st_mtime_ns, len(track), len(track.segment_starts), min_lat, min_lon, max_lat, max_lon))
+            for column in (track.lat, track.lon, track.ele, track.time): f.write(np.ascontiguousarray(column, dtype="<f8").tobytes())
+            f.write(np.ascontiguousarray(track.segment_starts, dtype="<i8").tobytes())
+        os.replace(temp_path, sidecar_path)
+    finally:
+        if os.path.exists(temp_path): os.remove(temp_path)
+
+def read_track_sidecar(sidecar_path: str, source_stat):
+    """ Memory-maps a sidecar written for exactly this version of the GPX file; None if missing, stale or damaged. """
+    try:
+        with open(sidecar_path, "rb") as f: header = f.read(TRACK_SIDECAR_HEADER.size); file_size = os.fstat(f.fileno()).st_size
+    except OSError: return None
+    if len(header) < TRACK_SIDECAR_HEADER.size: return None
+    magic, version, size, mtime_ns, n, n_segments, min_lat, min_lon, max_lat, max_lon = TRACK_SIDECAR_HEADER.unpack(header)
+    if (magic, version, size, mtime_ns) != (TRACK_SIDECAR_MAGIC, TRACK_SIDECAR_FORMAT, source_stat.st_size, source_stat.st_mtime_ns): return None
+    if file_size != TRACK_SIDECAR_HEADER.size + 8 * (4 * n + n_segments): return None
+    if n == 0: return GPXTrack(*(np.zeros(0) for _ in range(4)), np.zeros(0, dtype=np.int64))
+    columns = np.memmap(sidecar_path, dtype="<f8", mode="r", offset=TRACK_SIDECAR_HEADER.size, shape=(4, n))
+    segment_starts = np.memmap(sidecar_path, dtype="<i8", mode="r", offset=TRACK_SIDECAR_HEADER.size + 32 * n, shape=(n_segments,)) if n_segments else np.zeros(0, dtype=np.int64)
+    return GPXTrack(columns[0], columns[1], columns[2], columns[3], segment_starts, ((min_lat, min_lon), (max_lat, max_lon)))
+
+def load_gpx_track(gpx_path: str, use_sidecar: bool = True) -> GPXTrack:
+    """ Loads a GPX track, from its binary sidecar when that is still current, otherwise by parsing (and refreshing the sidecar).
+
+    The sidecar is `.<name>.gpx.v360track` next to the GPX; a folder that is not writable just means no sidecar.
+    """
+    if not use_sidecar: return parse_gpx_track(gpx_path)
+    source_stat = os.stat(gpx_path); sidecar_path = track_sidecar_path(gpx_path)
+    track = read_track_sidecar(sidecar_path, source_stat)
+    if track is not None: return track
+    track = parse_gpx_track(gpx_path)
+    try: write_track_sidecar(track, sidecar_path, source_stat)
+    except OSError: pass
+    return track
+
+def format_track_stats(stats: dict) -> str:
+    duration = int(stats["duration_s"])
+    return (f"{stats['distance_m'] / 1000:.2f} km in {duration // 3600}:{duration // 60 % 60:02d}:{duration % 60:02d}, "
+            f"avg {stats['avg_speed_mps'] * 3.6:.1f} km/h moving, max {stats['max_speed_mps'] * 3.6:.1f} km/h, "
+            f"+{stats['elevation_gain_m']:.0f} m / -{stats['elevation_loss_m']:.0f} m")
+
+# --- Map Tile Cache ---
+
+TILE_CACHE_MAX_BYTES = 512 * 1024 * 1024
+TILE_PREFETCH_LIMIT = 4000
+TILE_TOUCH_BATCH = 256  # cache hits whose last_used is written back in one commit
+TILE_IMAGE_MAGIC = (b"\x89PNG\r\n\x1a\n", b"\xff\xd8\xff")  # PNG, JPEG
+
+class TileCache:
+    """ Map tiles keyed by (server, z, x, y) in one SQLite file, capped in size with least-recently-used eviction. """
+    def __init__(self, path: str, max_bytes: int = TILE_CACHE_MAX_BYTES, timeout: float = 10.0, user_agent: str = "Vision360-Toolbox"):
+        self.path = path; self.max_bytes = max_bytes; self.timeout = timeout; self.user_agent = user_agent
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL"); self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS tiles (server TEXT, z INTEGER, x INTEGER, y INTEGER, data BLOB, size INTEGER, last_used REAL, PRIMARY KEY (server, z, x, y))")
+        self._db.execute("CREATE INDEX IF NOT EXISTS tiles_last_used ON tiles (last_used)")
+        self._db.commit()
+        self.total_bytes = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM tiles").fetchone()[0]
+        self.hits = 0; self.misses = 0; self._touched = {}
+
+    def get(self, server: str, z: int, x: int, y: int):
+        with self._lock:
+            row = self._db.execute("SELECT data FROM tiles WHERE server=? AND z=? AND x=? AND y=?", (server, z, x, y)).fetchone()
+            if row is None: return None
+            # Hits only refresh last_used in memory; it reaches the database in batches, before eviction and on close.
+            self._touched[(server, z, x, y)] = time.time()
+            if len(self._touched) >= TILE_TOUCH_BATCH: self._write_touched(); self._db.commit()
+        return row[0]
+
+    def _write_touched(self):
+        self._db.executemany("UPDATE tiles SET last_used=? WHERE server=? AND z=? AND x=? AND y=?", [(used, *key) for key, used in self._touched.items()])
+        self._touched.clear()
+
+    def contains(self, server: str, z: int, x: int, y: int) -> bool:
+        with self._lock: return self._db.execute("SELECT 1 FROM tiles WHERE server=? AND z=? AND x=? AND y=?", (server, z, x, y)).fetchone() is not None
+
+    def put(self, server: str, z: int, x: int, y: int, data: bytes):
+        with self._lock:
+            old = self._db.execute("SELECT size FROM tiles WHERE server=? AND z=? AND x=? AND y=?", (server, z, x, y)).fetchone(); self._touched.pop((server, z, x, y), None)
+            self._db.execute("INSERT OR REPLACE INTO tiles VALUES (?, ?, ?, ?, ?, ?, ?)", (server, z, x, y, sqlite3.Binary(data), len(data), time.time()))
+            self.total_bytes += len(data) - (old[0] if old else 0)
+            if self.total_bytes > self.max_bytes: self._write_touched(); self._evict()
+            self._db.commit()
+
+    def _evict(self):
+        # Drop to 90% of the cap so eviction doesn't run again on every insert.
+        target = self.max_bytes * 0.9
+        while self.total_bytes > target:
+            rows = self._db.execute("SELECT rowid, size FROM tiles ORDER BY last_used LIMIT 256").fetchall()
+            if not rows: self.total_bytes = 0; break
+            for rowid, size in rows:
+                if self.total_bytes <= target: break
+                self._db.execute("DELETE FROM tiles WHERE rowid=?", (rowid,)); self.total_bytes -= size
+
+    def fetch(self, server: str, z: int, x: int, y: int):
+        """ Returns tile bytes from the cache, downloading and storing them on a miss.
+
+        Returns None if the server has no such tile; raises OSError when the server can't be reached or answers with
+        something that is not a PNG or JPEG (a captive portal or an HTML error page), which is never cached.
+        """
+        data = self.get(server, z, x, y)
+        if data is not None: self.hits += 1; return data
+        self.misses += 1
+        url = server.replace("{x}", str(x)).replace("{y}", str(y)).replace("{z}", str(z))
+        try:
+            with urllib.request.urlopen(urllib.request.Request(url, headers={"User-Agent": self.user_agent}), timeout=self.timeout) as response: data = response.read()
+        except urllib.error.HTTPError: return None
+        if not data: return None
+        if not data.startswith(TILE_IMAGE_MAGIC): raise OSError(f"{url} did not return an image")
+        self.put(server, z, x, y, data)
+        return data
+
+    def prefetch_track(self, server: str, track_lod, zooms, margin: int = 1, stop_event: threading.Event = None, workers: int = 4, limit: int = TILE_PREFETCH_LIMIT, progress_callback=None) -> int:
+        """ Downloads the uncached tiles within `margin` tiles of the track at each zoom; returns how many were fetched. """
+        wanted = []
+        for z in zooms:
+            tiles = track_corridor_tiles(track_lod, z, margin)
+            wanted.extend((z, tx, ty) for tx, ty in tiles if not self.contains(server, z, tx, ty))
+            if len(wanted) >= limit: break
+        wanted = deque(wanted[:limit]); fetched = [0]; lock = threading.Lock()
+        def worker():
+            while not (stop_event and stop_event.is_set()):
+                with lock:
+                    if not wanted: return
+                    z, tx, ty = wanted.popleft()
+                try:
+                    if self.fetch(server, z, tx, ty) is not None:
+                        with lock: fetched[0] += 1
+                except OSError: return
+                if progress_callback: progress_callback(fetched[0], len(wanted))
+        threads = [threading.Thread(target=worker, daemon=True) for _ in range(workers)]
+        for thread in threads: thread.start()
+        for thread in threads: thread.join()
+        return fetched[0]
+
+    def close(self):
+        with self._lock:
+            if self._touched: self._write_touched(); self._db.commit()
+            self._db.close()
+
+def track_corridor_tiles(track_lod, zoom: int, margin: int = 1) -> set:
+    """ Tile coordinates at `zoom` that the track passes through, widened by `margin` tiles on every side. """
+    scale = 2 ** zoom; indices = track_lod.level_for_zoom(zoom)
+    tx, ty = track_lod.x[indices] * scale, track_lod.y[indices] * scale
+    # Simplified segments can be long, so sample each one at least once per tile it crosses.
+    steps = np.maximum(np.ceil(np.maximum(np.abs(np.diff(tx)), np.abs(np.diff(ty)))), 1).astype(np.int64)
+    offsets = np.arange(steps.sum()) - np.repeat(np.cumsum(steps) - steps, steps)
+    fraction = offsets / np.repeat(steps, steps)
+    start = np.repeat(np.arange(len(steps)), steps)
+    sx = np.r_[tx[start] + (tx[start + 1] - tx[start]) * fraction, tx[-1:]]
+    sy = np.r_[ty[start] + (ty[start + 1] - ty[start]) * fraction, ty[-1:]]
+    centers = set(zip(np.floor(sx).astype(np.int64).tolist(), np.floor(sy).astype(np.int64).tolist()))
+    return {(cx + dx, cy + dy) for cx, cy in centers for dx in range(-margin, margin + 1) for dy in range(-margin, margin + 1)
+            if 0 <= cx + dx < scale and 0 <= cy + dy < scale}
+
+# --- GUI Application ---
+
+UI_FLUSH_INTERVAL_MS = 33  # log, queue rows and progress are pushed to the widgets at most ~30 times a second
+LOG_VIEW_MAX_LINES = 2000
+
+class InstaToolApp:
+    def __init__(self, master):
+        self.master = master
+        
+        # <-- שינוי 3: טעינת והגדרת הלוגו כאייקון החלון -->
+        try:
+            # החלף את "logo.png" בשם המדויק של קובץ הלוגו שלך
+            logo_path = resource_path("logo.png") 
+            logo_image = tk.PhotoImage(file=logo_path)
+            master.iconphoto(True, logo_image)
+        except Exception as e:
+            print(f"Error loading application icon: {e}")
+        # <-- סוף קטע הקוד של הלוגו -->
+
+        master.title("Insta360 Toolbox")
+        master.geometry("900x800")
+        self.btc_address = "BC1QM2E6SE7FUE4WEPMXU2ASM47AS59WVX4WL6WRXW"
+        self.kofi_url = "https://ko-fi.com/pavelrst"
+        self.contact_email = "Pavelrzt@gmail.com"
+        self.sdk_path = find_executable("testSDKDemo"); self.exiftool_path = find_executable("exiftool"); self.ffprobe_path = find_executable("ffprobe")
+        try: self.media_catalog = MediaCatalog(os.path.join(default_cache_dir(), "media.sqlite"), self.ffprobe_path, self.exiftool_path)
+        except (OSError, sqlite3.Error) as e: self.media_catalog = None; print(f"Media catalog unavailable: {e}")
+        self.model_dir = default_model_dir(self.sdk_path)
+        self.input_file_var = tk.StringVar(); self.output_folder_var = tk.StringVar(); self.resolution_var = tk.StringVar(); self.stitcher_model_var = tk.StringVar()
+        self.ENHANCEMENT_MAP = ENHANCEMENT_MAP
+        self.enhancement_vars = {key: tk.BooleanVar() for key in self.ENHANCEMENT_MAP}
+        self.found_models = {}; self.available_stitcher_models = []
+        self.discover_models()
+        self.log_buffer = LogBuffer(); self._dirty_jobs = {}; self._pending_progress = None; self._ui_lock = threading.Lock()
+        self.convert_input_files = []; self.parallel_jobs_var = tk.IntVar(value=default_conversion_workers()); self.save_job_logs_var = tk.BooleanVar(value=False); self.skip_up_to_date_var = tk.BooleanVar(value=True)
+        self.conversion_queue = ConversionQueue(self.sdk_path, self.model_dir, self.parallel_jobs_var.get(), self.log_message, job_callback=self.on_job_update, batch_callback=self.on_batch_finished)
+        self.gpx_input_file_var = tk.StringVar(); self.gpx_output_file_var = tk.StringVar(); self.gpx_input_files = []
+        self.create_widgets()
+        self.check_executables()
+        self.flush_ui()
+
+    def create_widgets(self):
+        main_frame = ttk.Frame(self.master, padding="10"); main_frame.pack(fill=tk.BOTH, expand=True)
+        main_frame.rowconfigure(0, weight=1); main_frame.columnconfigure(0, weight=1)
+        style = ttk.Style(self.master); style.theme_use('clam'); style.configure("blue.Horizontal.TProgressbar", troughcolor='#E0E0E0', background='#0078D7', thickness=20)
+        style.configure("Link.TLabel", foreground="blue", font=('TkDefaultFont', 10, 'underline'))
+        self.notebook = ttk.Notebook(main_frame); self.notebook.grid(row=0, column=0, sticky="nsew")
+        convert_tab = ttk.Frame(self.notebook, padding="10"); self.notebook.add(convert_tab, text="Convert to 360 MP4")
+        gpx_tab = ttk.Frame(self.notebook, padding="10"); self.notebook.add(gpx_tab, text="Extract GPX")
+        map_tab = ttk.Frame(self.notebook, padding="10"); self.notebook.add(map_tab, text="Map Viewer")
+        about_tab = ttk.Frame(self.notebook, padding="10"); self.notebook.add(about_tab, text="About")
+        self.create_conversion_tab(convert_tab)
+        self.create_gpx_tab(gpx_tab)
+        self.create_map_tab(map_tab)
+        self.create_about_tab(about_tab)
+        log_frame = ttk.LabelFrame(main_frame, text="Log Output"); log_frame.grid(row=1, column=0, sticky="ew", pady=(10,0))
+        self.log_text = scrolledtext.ScrolledText(log_frame, wrap=tk.WORD, height=8, font=("monospace", 9)); self.log_text.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+        self.log_text.configure(state='disabled'); self.log_text.tag_config("error", foreground="#d9534f"); self.log_text.tag_config("success", foreground="#5cb85c")
+
+    def create_conversion_tab(self, tab):
+        # ... no changes ...
+        input_frame = ttk.LabelFrame(tab, text="1. Select Input File(s)"); input_frame.pack(fill=tk.X, padx=5, pady=5)
+        ttk.Entry(input_frame, textvariable=self.input_file_var, state="readonly").pack(side=tk.LEFT, fill=tk.X, expand=True, padx=5, pady=5)
+        ttk.Button(input_frame, text="Browse...", command=self.select_convert_input_file).pack(side=tk.LEFT, padx=5, pady=5)
+        ttk.Button(input_frame, text="Index Folder...", command=self.start_folder_index_thread).pack(side=tk.LEFT, padx=(0, 5), pady=5)
+        output_frame = ttk.LabelFrame(tab, text="2. Select Output Folder"); output_frame.pack(fill=tk.X, padx=5, pady=5)
+        ttk.Entry(output_frame, textvariable=self.output_folder_var, state="readonly").pack(side=tk.LEFT, fill=tk.X, expand=True, padx=5, pady=5)
+        ttk.Button(output_frame, text="Browse...", command=self.select_output_folder).pack(side=tk.LEFT, padx=5, pady=5)
+        options_frame = ttk.LabelFrame(tab, text="3. Conversion Options"); options_frame.pack(fill=tk.X, padx=5, pady=5)
+        res_frame = ttk.Frame(options_frame); res_frame.pack(fill=tk.X, padx=5, pady=2)
+        ttk.Label(res_frame, text="Output Resolution:", width=16).pack(side=tk.LEFT)
+        self.res_combobox = ttk.Combobox(res_frame, textvariable=self.resolution_var, state="disabled"); self.res_combobox.pack(side=tk.LEFT, fill=tk.X, expand=True)
+        stitcher_frame = ttk.Frame(options_frame); stitcher_frame.pack(fill=tk.X, padx=5, pady=2)
+        ttk.Label(stitcher_frame, text="Stitcher Model:", width=16).pack(side=tk.LEFT)
+        self.stitcher_combobox = ttk.Combobox(stitcher_frame, textvariable=self.stitcher_model_var, values=self.available_stitcher_models, state="disabled"); self.stitcher_combobox.pack(side=tk.LEFT, fill=tk.X, expand=True)
+        jobs_frame = ttk.Frame(options_frame); jobs_frame.pack(fill=tk.X, padx=5, pady=2)
+        ttk.Label(jobs_frame, text="Parallel Jobs:", width=16).pack(side=tk.LEFT)
+        ttk.Spinbox(jobs_frame, from_=1, to=os.cpu_count() or 1, textvariable=self.parallel_jobs_var, width=5, state="readonly", command=self.change_parallel_jobs).pack(side=tk.LEFT)
+        ttk.Checkbutton(jobs_frame, text="Save full SDK log per clip", variable=self.save_job_logs_var).pack(side=tk.LEFT, padx=(20, 0))
+        ttk.Checkbutton(jobs_frame, text="Skip clips already rendered with these settings", variable=self.skip_up_to_date_var).pack(side=tk.LEFT, padx=(20, 0))
+        enhancements_frame = ttk.LabelFrame(tab, text="4. Enhancements"); enhancements_frame.pack(fill=tk.X, padx=5, pady=5)
+        self.enhancement_checkboxes = {}
+        for name in self.ENHANCEMENT_MAP.keys():
+            cb = ttk.Checkbutton(enhancements_frame, text=name, variable=self.enhancement_vars[name], state="disabled")
+            cb.pack(side=tk.LEFT, padx=10, pady=5); self.enhancement_checkboxes[name] = cb
+            if name in self.found_models: cb.config(state="normal")
+        control_frame = ttk.Frame(tab); control_frame.pack(fill=tk.X, padx=5, pady=10)
+        self.convert_button = ttk.Button(control_frame, text="Start Conversion", command=self.start_conversion_thread, state="disabled"); self.convert_button.pack(side=tk.LEFT, padx=5)
+        self.cancel_button = ttk.Button(control_frame, text="Cancel", command=self.cancel_conversion, state="disabled"); self.cancel_button.pack(side=tk.LEFT, padx=5)
+        progress_container = ttk.Frame(control_frame); progress_container.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=5)
+        self.progress_bar = ttk.Progressbar(progress_container, style="blue.Horizontal.TProgressbar"); self.progress_bar.pack(fill=tk.X, expand=True)
+        self.progress_label = ttk.Label(progress_container, text="0%", anchor="center", font=("Arial", 10, "bold"), background='#E0E0E0', foreground='black'); self.progress_label.place(relwidth=1.0, relheight=1.0)
+        queue_frame = ttk.LabelFrame(tab, text="Conversion Queue"); queue_frame.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+        self.queue_tree = ttk.Treeview(queue_frame, columns=("file", "resolution", "status", "progress"), show="headings", height=5)
+        for column, heading, width in (("file", "File", 380), ("resolution", "Resolution", 90), ("status", "Status", 90), ("progress", "Progress", 80)):
+            self.queue_tree.heading(column, text=heading); self.queue_tree.column(column, width=width, stretch=(column == "file"))
+        self.queue_tree.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+    
+    def create_gpx_tab(self, tab):
+        # ... no changes ...
+        gpx_input_frame = ttk.LabelFrame(tab, text="1. Select Input INSV File(s) - several are merged into one track"); gpx_input_frame.pack(fill=tk.X, padx=5, pady=10)
+        ttk.Entry(gpx_input_frame, textvariable=self.gpx_input_file_var, state="readonly").pack(side=tk.LEFT, fill=tk.X, expand=True, padx=5, pady=5)
+        ttk.Button(gpx_input_frame, text="Browse...", command=self.select_gpx_input_file).pack(side=tk.LEFT, padx=5, pady=5)
+        gpx_output_frame = ttk.LabelFrame(tab, text="2. Select Output GPX File Path"); gpx_output_frame.pack(fill=tk.X, padx=5, pady=10)
+        ttk.Entry(gpx_output_frame, textvariable=self.gpx_output_file_var, state="readonly").pack(side=tk.LEFT, fill=tk.X, expand=True, padx=5, pady=5)
+        ttk.Button(gpx_output_frame, text="Browse...", command=self.select_gpx_output_file).pack(side=tk.LEFT, padx=5, pady=5)
+        self.native_gps_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(tab, text="Read GPS from the .insv trailer directly (faster; ExifTool still handles files it does not recognize)", variable=self.native_gps_var).pack(anchor=tk.W, padx=5)
+        gpx_control_frame = ttk.Frame(tab); gpx_control_frame.pack(fill=tk.X, padx=5, pady=20)
+        self.gpx_extract_button = ttk.Button(gpx_control_frame, text="Extract GPX", command=self.start_gpx_extraction_thread, state="disabled"); self.gpx_extract_button.pack()
+
+    def create_map_tab(self, tab):
+        # ... no changes ...
+        tab.rowconfigure(1, weight=1); tab.columnconfigure(0, weight=1)
+        self.tile_servers = {"Google Normal": "https://mt0.google.com/vt/lyrs=m&hl=en&x={x}&y={y}&z={z}&s=Ga", "Google Satellite": "https://mt0.google.com/vt/lyrs=s,h&hl=en&x={x}&y={y}&z={z}&s=Ga", "OpenStreetMap": "https://a.tile.openstreetmap.org/{z}/{x}/{y}.png"}
+        controls_frame = ttk.Frame(tab); controls_frame.grid(row=0, column=0, sticky="ew", pady=(0, 10))
+        ttk.Button(controls_frame, text="Load GPX File...", command=self.load_gpx_from_dialog).pack(side=tk.LEFT, padx=(0, 10))
+        ttk.Label(controls_frame, text="Map Type:").pack(side=tk.LEFT)
+        self.map_type_combo = ttk.Combobox(controls_frame, state="readonly", values=list(self.tile_servers.keys())); self.map_type_combo.pack(side=tk.LEFT); self.map_type_combo.set("OpenStreetMap"); self.map_type_combo.bind("<<ComboboxSelected>>", self.change_map_type)
+        self.prefetch_tiles_var = tk.BooleanVar(value=False); self.prefetch_stop = None
+        ttk.Checkbutton(controls_frame, text="Prefetch tiles along track", variable=self.prefetch_tiles_var).pack(side=tk.LEFT, padx=(10, 0))
+        try: self.tile_cache = TileCache(os.path.join(default_cache_dir(), "tiles.sqlite"))
+        except (OSError, sqlite3.Error) as e: self.tile_cache = None; self.log_message(f"[!] Map tile cache unavailable, tiles will not be kept: {e}", "error")
+        self.map_widget = TrackMapView(tab, corner_radius=0, tile_cache=self.tile_cache); self.map_widget.grid(row=1, column=0, sticky="nsew"); self.map_widget.set_tile_server(self.tile_servers[self.map_type_combo.get()]); self.map_widget.set_position(48.8566, 2.3522); self.map_widget.set_zoom(5)
+        
+    def create_about_tab(self, tab):
+        tab.columnconfigure(0, weight=1)
+        
+        # --- App Description ---
+        desc_frame = ttk.LabelFrame(tab, text="What is this thing anyway?", padding=15)
+        desc_frame.grid(row=0, column=0, sticky="ew", pady=10)
+        title_font = ('TkDefaultFont', 12, 'bold')
+        ttk.Label(desc_frame, text="Your Insta360 Desktop Workflow Hub", font=title_font).pack(anchor="w", pady=(0,10))
+        desc_text = "    This toolbox simplifies your workflow by combining the power of the official Insta360 SDK for flawless video conversion with the precision of the renowned ExifTool for GPS data extraction, all wrapped in one simple interface."
+        ttk.Label(desc_frame, text=desc_text, wraplength=700, justify="left").pack(anchor="w")
+
+        # --- Credits and Support ---
+        support_frame = ttk.LabelFrame(tab, text="Credits & Support", padding=15)
+        support_frame.grid(row=1, column=0, sticky="ew", pady=10)
+        
+        credit_text = "Vision and concept Lovingly crafted by Pavel Rosental.\nWith Help by his AI assistant, Gemini."
+        ttk.Label(support_frame, text=credit_text, font=('TkDefaultFont', 10, 'italic'), justify="left").pack(anchor="w", pady=(0, 15))
+
+        ttk.Label(support_frame, text="If this tool saved you time or a headache, consider fueling future development:", justify="left").pack(anchor="w", pady=(0, 10))
+
+        # Contact
+        contact_frame = ttk.Frame(support_frame)
+        contact_frame.pack(anchor="w", pady=5, padx=20)
+        ttk.Label(contact_frame, text=" • Contact: ").pack(side=tk.LEFT)
+        self.email_link = ttk.Label(contact_frame, text=self.contact_email, style="Link.TLabel", cursor="hand2")
+        self.email_link.pack(side=tk.LEFT)
+        self.email_link.bind("<Button-1>", lambda e: self.copy_to_clipboard(self.email_link, self.contact_email, "Email"))
+        
+        # Coffee (Ko-fi) link
+        kofi_frame = ttk.Frame(support_frame)
+        kofi_frame.pack(anchor="w", pady=5, padx=20)
+        ttk.Label(kofi_frame, text=" • Buy me a coffee at: ").pack(side=tk.LEFT)
+        self.kofi_link = ttk.Label(kofi_frame, text=self.kofi_url, style="Link.TLabel", cursor="hand2")
+        self.kofi_link.pack(side=tk.LEFT)
+        self.kofi_link.bind("<Button-1>", lambda e: self.copy_to_clipboard(self.kofi_link, self.kofi_url, "URL"))
+
+        # Bitcoin donations
+        btc_frame = ttk.Frame(support_frame)
+        btc_frame.pack(anchor="w", pady=5, padx=20)
+        ttk.Label(btc_frame, text=" • Bitcoin donations:").pack(anchor="w", pady=(5,2))
+        btc_addr_frame = ttk.Frame(btc_frame); btc_addr_frame.pack(anchor="w", pady=5)
+        btc_entry = ttk.Entry(btc_addr_frame, width=45); btc_entry.insert(0, self.btc_address); btc_entry.config(state="readonly"); btc_entry.pack(side=tk.LEFT)
+        self.copy_button = ttk.Button(btc_addr_frame, text="Copy", command=self.copy_btc_address, width=8); self.copy_button.pack(side=tk.LEFT, padx=5)
+
+    def copy_to_clipboard(self, widget, text_to_copy, item_name="Text"):
+        """Copies text to clipboard and provides feedback on a label widget."""
+        self.master.clipboard_clear()
+        self.master.clipboard_append(text_to_copy)
+        original_text = widget['text']
+        widget.config(text="Copied to clipboard!", style="")
+        self.master.after(2000, lambda: widget.config(text=original_text, style="Link.TLabel"))
+        self.log_message(f"{item_name} copied to clipboard!")
+
+    def copy_btc_address(self):
+        """Copies text to clipboard and provides feedback on the BTC button."""
+        self.master.clipboard_clear()
+        self.master.clipboard_append(self.btc_address)
+        original_text = self.copy_button['text']
+        self.copy_button.config(text="Copied!")
+        self.master.after(1500, lambda: self.copy_button.config(text=original_text))
+        self.log_message("BTC address copied to clipboard!")
+        
+    def change_map_type(self, event=None):
+        map_type = self.map_type_combo.get(); self.map_widget.set_tile_server(self.tile_servers[map_type]); self.log_message(f"Map type changed to {map_type}.")
+        if self.map_widget.track_lod is not None and self.prefetch_tiles_var.get(): self.start_tile_prefetch(self.map_widget.track_lod)
+    def start_tile_prefetch(self, track_lod, extra_zooms: int = 3):
+        if self.tile_cache is None: return
+        if self.prefetch_stop: self.prefetch_stop.set()
+        self.prefetch_stop = stop_event = threading.Event(); server = self.map_widget.tile_server
+        # Start at the zoom that fits the whole track in the widget, then go a few levels deeper.
+        span = max(track_lod.x.max() - track_lod.x.min(), track_lod.y.max() - track_lod.y.min(), 1e-9)
+        base_zoom = int(np.clip(np.floor(np.log2(min(self.map_widget.width, self.map_widget.height) / 256 / span)), 0, self.map_widget.max_zoom))
+        zooms = list(range(base_zoom, min(base_zoom + extra_zooms, self.map_widget.max_zoom) + 1))
+        def prefetch():
+            fetched = self.tile_cache.prefetch_track(server, track_lod, zooms, stop_event=stop_event)
+            if not stop_event.is_set(): self.log_message(f"[+] Prefetched {fetched} map tiles for zoom {zooms[0]}-{zooms[-1]}.", "success")
+        threading.Thread(target=prefetch, daemon=True).start()
+    def load_gpx_from_dialog(self):
+        file_path = filedialog.askopenfilename(title="Select GPX File", filetypes=[("GPX files", "*.gpx")])
+        if file_path: self.display_gpx_on_map(file_path)
+    def display_gpx_on_map(self, gpx_path):
+        self.log_message(f"Loading GPX path on map from: {os.path.basename(gpx_path)}")
+        try:
+            track = load_gpx_track(gpx_path)
+            if not len(track): messagebox.showwarning("No Points", "The selected GPX file contains no track points to display."); return
+            self.map_widget.delete_all_path()
+            track_lod = TrackLOD(track.lat, track.lon)
+            self.map_widget.set_track(track_lod, color="#FF0000", width=3)
+            if track.bounds: self.map_widget.fit_bounding_box(*track.map_bounds())
+            self.log_message(f"Successfully displayed {len(track)} points on the map ({len(track_lod.level_for_zoom(round(self.map_widget.zoom)))} drawn at this zoom).")
+            self.log_message(f"    Track: {format_track_stats(track.stats())}")
+            if self.prefetch_tiles_var.get(): self.start_tile_prefetch(track_lod)
+            self.notebook.select(2)
+        except Exception as e:
+            self.log_message(f"ERROR loading GPX on map: {e}", "error")
+            messagebox.showerror("GPX Error", f"Could not load or parse the GPX file.\n\nDetails: {e}")
+    def run_gpx_extraction(self):
+        input_files, output_file, native = self.gpx_input_files or [self.gpx_input_file_var.get()], self.gpx_output_file_var.get(), self.native_gps_var.get()
+        if len(input_files) > 1: success = extract_merged_gpx(self.exiftool_path, input_files, output_file, workers=min(len(input_files), os.cpu_count() or 4), log_callback=self.log_message, catalog=self.media_catalog, native=native)
+        else: success = extract_gpx_using_proven_method(self.exiftool_path, input_files[0], output_file, self.log_message, catalog=self.media_catalog, native=native)
+        if success: self.master.after(0, self.display_gpx_on_map, output_file)
+        self.master.after(0, self.check_gpx_inputs)
+    def discover_models(self):
+        self.available_stitcher_models, self.found_models = discover_models(self.model_dir)
+    def log_message(self, message, tag=None):
+        # Safe from any thread; flush_ui() moves buffered lines into the widget in batches.
+        self.log_buffer.append(message, tag)
+    def update_progress(self, value):
+        with self._ui_lock: self._pending_progress = value
+    def clear_log(self):
+        self.log_buffer.clear(); self.log_text.configure(state='normal'); self.log_text.delete(1.0, tk.END); self.log_text.configure(state='disabled')
+    def flush_ui(self):
+        try: self._flush_log(); self._flush_jobs()
+        finally: self.master.after(UI_FLUSH_INTERVAL_MS, self.flush_ui)
+    def _flush_log(self):
+        lines, dropped = self.log_buffer.drain()
+        if not lines: return
+        self.log_text.configure(state='normal')
+        if dropped: self.log_text.insert(tk.END, f"[...] {dropped} log lines skipped (enable 'Save full SDK log per clip' to keep everything)\n", "error")
+        # One insert per run of equally tagged lines instead of one per line.
+        start = 0
+        for i in range(1, len(lines) + 1):
+            if i == len(lines) or lines[i][1] != lines[start][1]:
+                self.log_text.insert(tk.END, "".join(message + "\n" for message, _ in lines[start:i]), lines[start][1]); start = i
+        excess = int(self.log_text.index('end-1c').split('.')[0]) - LOG_VIEW_MAX_LINES
+        if excess > 0: self.log_text.delete('1.0', f'{excess + 1}.0')
+        self.log_text.configure(state='disabled'); self.log_text.see(tk.END)
+    def _flush_jobs(self):
+        with self._ui_lock:
+            jobs = list(self._dirty_jobs.values()); self._dirty_jobs.clear(); progress = self._pending_progress; self._pending_progress = None
+        if progress is not None: self.progress_bar['value'] = progress; self.progress_label['text'] = f"{progress}%"
+        if not jobs: return
+        for job in jobs:
+            values = (job.name, job.resolution, job.state.title(), f"{job.progress}%")
+            if self.queue_tree.exists(str(job.job_id)): self.queue_tree.item(str(job.job_id), values=values)
+            else: self.queue_tree.insert("", tk.END, iid=str(job.job_id), values=values)
+        finished = sum(j.finished for j in self.conversion_queue.jobs); progress = self.conversion_queue.overall_progress()
+        self.progress_bar['value'] = progress; self.progress_label['text'] = f"{progress}% ({finished}/{len(self.conversion_queue.jobs)})"
+    def check_executables(self):
+        found_all = True
+        if not self.sdk_path: self.log_message("[!] SDK ('testSDKDemo') not found.", "error"); found_all = False
+        if not self.ffprobe_path: self.log_message("[!] FFprobe not found.", "error"); found_all = False
+        if not self.exiftool_path: self.log_message("[!] ExifTool not found. GPX extraction is disabled.", "error"); self.gpx_extract_button.config(state="disabled"); found_all = False
+        if found_all: self.log_message("[+] All required executables found.", "success")
+        if self.model_dir: self.log_message("[+] Model directory found.", "success")
+        else: self.log_message("[!] Model directory not found.", "error")
+    def select_convert_input_file(self, *args):
+        file_paths = filedialog.askopenfilenames(title="Select .insv File(s)", filetypes=(("Insta360 Video", "*.insv"), ("All files", "*.*")))
+        if not file_paths: return
+        self.convert_input_files = list(file_paths)
+        self.input_file_var.set(file_paths[0] if len(file_paths) == 1 else f"{len(file_paths)} files: " + ", ".join(os.path.basename(f) for f in file_paths))
+        self.detect_and_update_options(file_paths[0]); self.check_convert_inputs()
+    def start_folder_index_thread(self):
+        if self.media_catalog is None: self.log_message("[!] Cannot index: media catalog unavailable.", "error"); return
+        folder = filedialog.askdirectory(title="Select Folder to Index")
+        if not folder: return
+        def index():
+            self.log_message(f"[*] Indexing .insv files in {folder}...")
+            started = time.monotonic()
+            records = self.media_catalog.index_folder(folder, workers=os.cpu_count() or 4, gps=bool(self.exiftool_path), log_callback=self.log_message)
+            with_gps = sum(1 for r in records if r["has_gps"])
+            self.log_message(f"[+] Indexed {len(records)} files ({with_gps} with GPS) in {time.monotonic() - started:.1f}s.", "success")
+        threading.Thread(target=index, daemon=True).start()
+    def detect_and_update_options(self, file_path):
+        resolution = get_video_resolution(file_path, self.log_message, catalog=self.media_catalog)
+        self.available_resolutions = available_resolutions(resolution)
+        self.res_combobox['values'] = self.available_resolutions; self.resolution_var.set(self.available_resolutions[0]); self.res_combobox.config(state="readonly")
+        if self.available_stitcher_models: self.stitcher_model_var.set(self.available_stitcher_models[0])
+        self.stitcher_combobox.config(state="readonly")
+    def select_output_folder(self, *args):
+        folder_path = filedialog.askdirectory(title="Select Output Folder")
+        if folder_path: self.output_folder_var.set(folder_path); self.check_convert_inputs()
+    def check_convert_inputs(self):
+        self.convert_button.config(state="normal" if self.input_file_var.get() and self.output_folder_var.get() else "disabled")
+    def set_convert_ui_state(self, is_running: bool):
+        # Options stay editable while running so further clips can be queued with different settings.
+        self.convert_button.config(text="Add to Queue" if is_running else "Start Conversion"); self.cancel_button.config(state="normal" if is_running else "disabled")
+    def change_parallel_jobs(self):
+        self.conversion_queue.set_max_workers(self.parallel_jobs_var.get())
+    def start_conversion_thread(self):
+        if not self.sdk_path: self.log_message("[!] Cannot start: SDK not found.", "error"); return
+        if self.conversion_queue.is_idle():
+            self.clear_log(); self.queue_tree.delete(*self.queue_tree.get_children()); self.update_progress(0)
+        self.set_convert_ui_state(is_running=True)
+        self.run_conversion()
+    def cancel_conversion(self):
+        selected = [job for job in self.conversion_queue.jobs if str(job.job_id) in self.queue_tree.selection()]
+        if not selected: self.log_message("\n[!] User requested to cancel all jobs. Terminating...", "error")
+        for job in selected or list(self.conversion_queue.jobs): self.conversion_queue.cancel(job)
+    def run_conversion(self):
+        input_files = self.convert_input_files or [self.input_file_var.get()]
+        output_folder, resolution, stitcher_model = self.output_folder_var.get(), self.resolution_var.get(), self.stitcher_model_var.get()
+        enhancements = {name: self.found_models[name] for name, var in self.enhancement_vars.items() if var.get() and name in self.found_models}
+        self.conversion_queue.set_max_workers(self.parallel_jobs_var.get())
+        self.conversion_queue.log_dir = os.path.join(default_cache_dir(), "logs") if self.save_job_logs_var.get() else None
+        force = not self.skip_up_to_date_var.get()
+        with self.conversion_queue.batch():
+            for input_file in input_files: self.conversion_queue.submit(input_file, output_folder, resolution, stitcher_model, enhancements, force=force)
+    def on_job_update(self, job):
+        with self._ui_lock: self._dirty_jobs[job.job_id] = job
+    def on_batch_finished(self, stats):
+        self.log_message(f"[+] Batch finished: {stats['done']} converted, {stats['skipped']} up to date, {stats['failed']} failed, {stats['cancelled']} cancelled in {stats['elapsed'] / 60:.1f} min "
+                         f"({stats['clips_per_hour']:.1f} clips/h, {stats['input_mb_per_s']:.1f} MB/s input).", "success" if not stats['failed'] else "error")
+        self.master.after(0, self.finalize_convert_ui)
+    def finalize_convert_ui(self):
+        self.set_convert_ui_state(is_running=False)
+    def select_gpx_input_file(self):
+        file_paths = filedialog.askopenfilenames(title="Select .insv File(s) with GPS Data", filetypes=(("Insta360 Video", "*.insv"), ("All files", "*.*")))
+        if file_paths:
+            self.gpx_input_files = sorted(file_paths)
+            if len(file_paths) == 1:
+                self.gpx_input_file_var.set(file_paths[0]); self.gpx_output_file_var.set(os.path.splitext(file_paths[0])[0] + ".gpx")
+            else:
+                self.gpx_input_file_var.set(f"{len(file_paths)} files: " + ", ".join(os.path.basename(f) for f in self.gpx_input_files))
+                self.gpx_output_file_var.set(os.path.splitext(self.gpx_input_files[0])[0] + "_merged.gpx")
+            self.gpx_extract_button.config(text="Merge GPX" if len(file_paths) > 1 else "Extract GPX")
+            self.check_gpx_inputs()
+    def select_gpx_output_file(self):
+        file_path = filedialog.asksaveasfilename(title="Save GPX File As...", defaultextension=".gpx", filetypes=(("GPX files", "*.gpx"), ("All files", "*.*")))
+        if file_path: self.gpx_output_file_var.set(file_path); self.check_gpx_inputs()
+    def check_gpx_inputs(self):
+        self.gpx_extract_button.config(state="normal" if self.gpx_input_file_var.get() and self.gpx_output_file_var.get() else "disabled")
+    def start_gpx_extraction_thread(self):
+        if not self.exiftool_path: self.log_message("[!] Cannot start: 'exiftool' not found.", "error"); return
+        self.clear_log()
+        self.gpx_extract_button.config(state="disabled")
+        threading.Thread(target=self.run_gpx_extraction, daemon=True).start()
+
+def run_gui():
+    root = tk.Tk()
+    app = InstaToolApp(root)
+    root.mainloop()